@@ -1,6 +1,11 @@
 import argparse
 
-from src.kindred.qlearning import learn, learn_async
+import numpy as np
+
+from src.kindred.pool import AsyncLearner
+from src.kindred.qlearning import SharedState, learn, learn_async
+from src.kindred.snapshot import save_Q
+from src.kindred.trajectory import TrajectoryRecorder
 
 
 def run():
@@ -17,11 +22,63 @@ def run():
     parser.add_argument('-i', '--iasync', type=int, help='I async update value.', default=5)
     parser.add_argument('-t', '--tmax', type=int, help='Maximum value for T.', default=20000)
     parser.add_argument('-s', '--size', type=int, help='Size of grid (rows * cols).', default=54)
+    parser.add_argument('-ad', '--adaptive', help='Tune I async update per agent.', action='store_true')
+    parser.add_argument('-imin', '--iasync-min', type=int, help='Minimum adaptive I async value.', default=1)
+    parser.add_argument('-imax', '--iasync-max', type=int, help='Maximum adaptive I async value.', default=100)
+    parser.add_argument(
+        '-mw', '--max-wait', type=float, help='Lock wait fraction that grows the adaptive interval.', default=0.1,
+    )
+    parser.add_argument(
+        '-md', '--max-delta', type=float, help='Delta entry that shrinks the adaptive interval.', default=0.1,
+    )
+    parser.add_argument('-m', '--multigrid', type=int, help='Number of coarse grid levels.', default=0)
+    parser.add_argument('-sh', '--shaping', type=float, help='Weight of reward shaping.', default=0.0)
+    parser.add_argument('-r', '--record', help='Directory to log transitions to.', default=None)
+    parser.add_argument('-nr', '--runs', type=int, help='Number of async runs on one pool.', default=1)
+    parser.add_argument(
+        '-d', '--dtype', help='Type of Q values.', choices=['float64', 'float32', 'float16'], default='float64',
+    )
+    parser.add_argument(
+        '-b', '--bits', type=int, help='Quantize Q to 8/16 bits for async sync and saving.', choices=[8, 16],
+    )
+    parser.add_argument('-o', '--save', help='File to save the learned Q matrix to (.npz).', default=None)
 
     args = parser.parse_args()
 
+    # reject options that the chosen mode would otherwise ignore.
+    if args.async and args.multigrid:
+        parser.error('--multigrid is only supported by the synchronous version.')
+    if args.async and args.shaping:
+        parser.error('--shaping is only supported by the synchronous version.')
+    if args.async and args.runs > 1 and args.record:
+        parser.error('--record is not supported with --runs > 1.')
+    if args.runs > 1 and not args.async:
+        parser.error('--runs is only supported by the asynchronous version.')
+
+    dtype = np.dtype(args.dtype).type
+
     Q = None
-    if args.async:
+    if args.async and args.runs > 1:
+        with AsyncLearner(num_agents=args.agents, size=args.size, dtype=dtype, bits=args.bits) as pool:
+            for _ in xrange(args.runs):
+                Q = pool.learn(
+                    I_async_update=args.iasync,
+                    T_max=args.tmax,
+                    epsilon=args.epsilon,
+                    alpha=args.alpha,
+                    gamma=args.gamma,
+                    adaptive=args.adaptive,
+                    I_bounds=(args.iasync_min, args.iasync_max),
+                    max_wait=args.max_wait,
+                    max_delta=args.max_delta,
+                )
+
+            intervals = pool.intervals
+            print('Startup time: {:.3f}s, learning time: {:.3f}s'.format(
+                pool.startup_time, sum(pool.learn_times),
+            ))
+    elif args.async:
+        shared_state = SharedState(args.size, dtype=dtype, bits=args.bits)
         Q = learn_async(
             num_agents=args.agents,
             I_async_update=args.iasync,
@@ -30,15 +87,36 @@ def run():
             epsilon=args.epsilon,
             alpha=args.alpha,
             gamma=args.gamma,
+            adaptive=args.adaptive,
+            I_bounds=(args.iasync_min, args.iasync_max),
+            record=args.record,
+            max_wait=args.max_wait,
+            max_delta=args.max_delta,
+            shared_state=shared_state,
         )
+        intervals = shared_state.get_intervals()
     else:
+        recorder = TrajectoryRecorder(args.record) if args.record else None
         _, Q = learn(
             num_episodes=args.episodes,
             epsilon=args.epsilon,
             alpha=args.alpha,
             gamma=args.gamma,
+            recorder=recorder,
+            multigrid_levels=args.multigrid,
+            shaping=args.shaping,
+            dtype=dtype,
         )
 
+        if recorder is not None:
+            recorder.close()
+
+    if args.async and args.adaptive:
+        print('I async update chosen per agent: {}'.format(intervals))
+
+    if args.save:
+        save_Q(args.save, Q, bits=args.bits)
+
     return Q
 
 if __name__ == '__main__':
@@ -10,6 +10,12 @@ class Agent(object):
     alpha = 0.0
     gamma = 0.0
 
+    # initialize weight of the reward shaping term to 0 (disabled).
+    shaping = 0.0
+
+    # initialize type of Q values to double precision.
+    dtype = np.float64
+
     # initialize constants to represent the choice of the epsilon greedy policy.
     RANDOM = 0
     ARGMAX = 1
@@ -18,32 +24,73 @@ class Agent(object):
     STEPS = 5001
 
     # initialize Q matrix to None.
-    Q = None
+    _Q = None
+
+    # per state maximum Q value and index of the action achieving it (see reset_argmax).
+    max_Q = None
+    max_action = None
+
+    # per state new state reached by each action (see reset_neighbours).
+    neighbours = None
     
-    def __init__(self, epsilon, alpha, gamma, grids=None):
+    def __init__(self, epsilon, alpha, gamma, grids=None, shaping=0.0, grid=None, dtype=np.float64):
         """
         Args:
             epsilon (float): Probability for Epsilon policy.
             alpha (float): Step size. Range in [0, 1].
             gamma (float): Discount factor. Range in [0, 1].
             grids (list[str|File]): List of paths to files representing grids.
+            shaping (float): Weight of the distance based reward shaping term (see
+                             get_potential). Disabled if 0.
+            grid (GridWorld): Grid to be used by the agent, e.g. a remote.RemoteGridWorld.
+                              If not specified, a GridWorld is created from grids.
+            dtype (numpy.dtype): Type of Q values, e.g. numpy.float32 or numpy.float16 to
+                                 reduce memory use on large grids.
 
         Returns:
             No explicit return value.
         """
         # initialize a GridWorld object to be used by the agent.
-        self.grid = GridWorld(grids=grids)
+        self.grid = grid or GridWorld(grids=grids)
 
         # set hyperparameters.
         self.epsilon = epsilon
         self.alpha = alpha
         self.gamma = gamma
+        self.shaping = shaping
+        self.dtype = dtype
 
         # initialize steps to 0. 
         self.steps = 0
 
+        # fix order of actions, and find the neighbours of every state on the grid.
+        self.actions = list(self.grid.actions)
+        self.reset_neighbours()
+
         # intialize Q matrix.
-        self.Q = np.zeros((self.grid.size, self.grid.size))
+        self.reset_Q()
+
+    @property
+    def Q(self):
+        """
+        Get Q matrix.
+
+        Returns:
+            numpy.Array: 2D array containing Q values for state transitions. Changes
+                         must go through update_Q to keep max_Q and max_action in sync.
+        """
+        return self._Q
+
+    @Q.setter
+    def Q(self, Q):
+        """
+        Replace Q matrix, recomputing maximum Q value for every state.
+
+        Args:
+            Q (numpy.Array): 2D array containing Q values for state transitions.
+        """
+        self._Q = Q
+        self.reset_argmax()
 
     @property
     def state(self):
@@ -70,7 +117,26 @@ class Agent(object):
             if self.steps == self.STEPS:
                 self.grid.update_grid()
 
+                # valid actions change with the grid.
+                self.reset_neighbours()
+                self.reset_argmax()
+
     def simulate_action(self, Q=None):
+        """
+        Simulates the next step of the agent, using the action chosen by choose_action.
+
+        Returns:
+            tuple[tuple, float]: Return (x, y) tuple representing new state, and
+                                 a float value representing the reward associated.
+        """
+        action = self.choose_action(Q=Q)
+
+        # simulate new state based on action obtained above.
+        new_state = self.grid.simulate(self.state, action)
+        
+        return new_state, self.get_reward(new_state)
+
+    def choose_action(self, Q=None):
         """
         Uses Epsilon policy to choose the next action to be taken by agent.
 
@@ -79,8 +145,7 @@ class Agent(object):
         reward.
 
         Returns:
-            tuple[tuple, float]: Return (x, y) tuple representing new state, and
-                                 a float value representing the reward associated.
+            Actions: Enum representing the action to be taken from the current state.
         """
         # choose action to take based on epsilon.
         method = choice(
@@ -98,18 +163,21 @@ class Agent(object):
         # else choose action maximizing reward.
         elif method == self.ARGMAX:
             action, _ = self.argmax(Q=Q)
-        # simulate new state based on action obtained above.
-        new_state = tuple(map(sum, zip(self.state, self.grid.actions[action])))
-        
-        return new_state, self.get_reward(new_state)
+
+        return action
 
     def argmax(self, state=None, Q=None):
         """
         Given a state, choose the action that maximizes reward.
 
+        Reads max_Q and max_action when using the agent's own Q matrix, and scans the
+        valid actions of state otherwise.
+
         Args:
             state (tuple): (x, y) tuple representing position of agent on grid.
                            If not specified, will use current state.
+            Q (numpy.Array): 2D array containing Q values for state transitions.
+                             If not specified, will use self.Q.
 
         Returns:
             tuple[Actions, float]: Return an Enum value representing the action
@@ -119,8 +187,9 @@ class Agent(object):
         # if state not provided explicitly, use current state.
         state = state or self.state     
        
-        if Q is None:
-            Q = self.Q
+        if Q is None or Q is self.Q:
+            index = self.get_linear_index(state)
+            return (self.actions[self.max_action[index]], self.max_Q[index])
 
         # calculate action to maximize Q(state, action).
         max_Q = float('-inf') 
@@ -133,14 +202,130 @@ class Agent(object):
 
         return (max_action, max_Q)
 
-    def get_reward(self, new_state):
+    def get_neighbours(self):
         """
-        Get reward value associated with 
+        Get the state reached by taking each action from each state.
+
+        Returns:
+            numpy.Array: 2D array of shape (size, len(self.actions)) holding the linear
+                         index of the new state, or -1 where the action is not valid.
         """
-        if new_state == self.grid.goal:
-            return 1.0
-        
-        return 0.0
+        rows, cols = self.grid.dimensions
+        x, y = np.meshgrid(np.arange(rows), np.arange(cols), indexing='ij')
+        open_cells = self.grid.grid != self.grid.BLOCKED
+
+        neighbours = np.full((self.grid.size, len(self.actions)), -1, dtype=int)
+        for i, action in enumerate(self.actions):
+            move = self.grid.actions[action]
+            new_x, new_y = x + move[0], y + move[1]
+
+            # keep moves that start on an open cell and end on an open cell inside the grid.
+            valid = (new_x >= 0) & (new_x < rows) & (new_y >= 0) & (new_y < cols) & open_cells
+            valid[valid] &= open_cells[new_x[valid], new_y[valid]]
+
+            neighbours[
+                self.get_linear_index((x[valid], y[valid])), i
+            ] = self.get_linear_index((new_x[valid], new_y[valid]))
+
+        return neighbours
+
+    def reset_neighbours(self):
+        """
+        Recompute neighbours of every state, whenever the grid is loaded or switched.
+
+        Also keeps the maximum Q value and the action achieving it for every state of a
+        zero Q matrix, used by reset_Q.
+        """
+        self.neighbours = self.get_neighbours()
+        valid = self.neighbours >= 0
+
+        # with all Q values equal, the first valid action of each state is chosen.
+        self.zero_action = valid.argmax(axis=1)
+        self.zero_Q = np.where(valid.any(axis=1), 0.0, -np.inf)
+
+    def reset_argmax(self):
+        """ Recompute maximum Q value and the action achieving it for every state. """
+        self.max_action, self.max_Q = self.get_greedy_actions()
+
+    def get_greedy_actions(self, Q=None):
+        """
+        Get the action maximizing Q value for every state at once.
+
+        Args:
+            Q (numpy.Array): 2D array containing Q values for state transitions.
+                             If not specified, will use self.Q.
+
+        Returns:
+            tuple[numpy.Array, numpy.Array]: Index into self.actions of the action chosen
+                                             for each state, and its Q value (-inf for
+                                             states without valid actions).
+        """
+        if Q is None:
+            Q = self.Q
+
+        values = np.where(
+            self.neighbours >= 0, Q[np.arange(self.grid.size)[:, None], self.neighbours], -np.inf,
+        )
+
+        # ties are broken in favour of the first action, as in a scan over valid actions.
+        return (values.argmax(axis=1), values.max(axis=1))
+
+    def update_argmax(self, index):
+        """
+        Recompute maximum Q value and the action achieving it for a single state.
+
+        Args:
+            index (int): Linear index of the state.
+        """
+        neighbours = self.neighbours[index]
+        values = np.where(neighbours >= 0, self.Q[index, neighbours], -np.inf)
+
+        self.max_action[index] = values.argmax()
+        self.max_Q[index] = values[self.max_action[index]]
+
+    def get_reward(self, new_state, state=None, shaped=True):
+        """
+        Get reward value associated with moving from one state to another.
+
+        The reward is given by the grid (see GridWorld.get_reward). If shaping is enabled,
+        the difference in potential between the two states is added, which leaves the
+        optimal policy unchanged.
+
+        Args:
+            new_state (tuple): (x, y) coordinates representing future position of agent.
+            state (tuple): (x, y) coordinates representing current position of agent.
+                           If not specified, will use current state.
+            shaped (bool): If False, leave out the shaping term.
+
+        Returns:
+            float: Reward for the transition.
+        """
+        # if state not provided explicitly, use current state.
+        state = state or self.state
+
+        reward = self.grid.get_reward(state, new_state)
+
+        if shaped and self.shaping:
+            reward += self.gamma * self.get_potential(new_state) - self.get_potential(state)
+
+        return reward
+
+    def get_potential(self, state):
+        """
+        Get shaping potential of a state, based on its distance to the goal.
+
+        Args:
+            state (tuple): (x, y) coordinates representing position of agent.
+
+        Returns:
+            float: Negative distance to goal scaled by self.shaping. Positions the goal
+                   can't be reached from are treated as one step further than any other.
+        """
+        distance = self.grid.distances[state]
+        if np.isinf(distance):
+            distance = self.grid.size
+
+        return -self.shaping * distance
 
     def get_Q(self, state, new_state, Q=None):
         """
@@ -172,14 +357,64 @@ class Agent(object):
             new_state (tuple): (x, y) coordinates representing future position of agent.
             value (float): Value to be updated.
         """
-        self.Q[(
-            self.get_linear_index(state),
-            self.get_linear_index(new_state),
-        )] = value
+        index = self.get_linear_index(state)
+        new_index = self.get_linear_index(new_state)
+        self.Q[index, new_index] = value
+
+        # compare the stored value, which is rounded to the type of Q.
+        value = self.Q[index, new_index]
+
+        # keep maximum Q value of state in sync with the update.
+        action = self.grid.get_action(state, new_state)
+        if action is None:
+            return
+
+        action = self.actions.index(action)
+        if self.neighbours[index, action] < 0:
+            return
+
+        max_action = self.max_action[index]
+        if action == max_action:
+            if value >= self.max_Q[index]:
+                self.max_Q[index] = value
+            else:
+                # the current maximum went down, so another action may now be larger.
+                self.update_argmax(index)
+        elif value > self.max_Q[index] or (value == self.max_Q[index] and action < max_action):
+            self.max_action[index] = action
+            self.max_Q[index] = value
+
+    def reset(self, epsilon, alpha, gamma):
+        """
+        Prepare the agent for a new run with new hyperparameters.
+
+        Moves the agent back to the start position of the first grid, resets steps to 0
+        and the Q matrix to zeros. The grid is only reloaded if it has been switched.
+
+        Args:
+            epsilon (float): Probability for Epsilon policy.
+            alpha (float): Step size. Range in [0, 1].
+            gamma (float): Discount factor. Range in [0, 1].
+        """
+        self.epsilon = epsilon
+        self.alpha = alpha
+        self.gamma = gamma
+
+        if self.steps >= self.STEPS:
+            self.grid.initialize_grid()
+            self.reset_neighbours()
+
+        self.grid.state = self.grid.start
+        self.steps = 0
+        self.reset_Q()
 
     def reset_Q(self):
         """ Reset Q matrix to zeros. """
-        self.Q = np.zeros((self.grid.size, self.grid.size))
+        self._Q = np.zeros((self.grid.size, self.grid.size), dtype=self.dtype)
+
+        # every state's maximum is now its first valid action, so no scan is needed.
+        self.max_action = self.zero_action.copy()
+        self.max_Q = self.zero_Q.copy()
 
     def get_linear_index(self, state):
         """
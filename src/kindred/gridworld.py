@@ -43,6 +43,9 @@ class GridWorld(object):
     goal = ()
     dimensions = ()
 
+    # shortest number of steps from each position to the goal.
+    distances = None
+
     # default grid(s).
     grids = ['resources/gridL.txt', 'resources/gridR.txt']
 
@@ -55,6 +58,9 @@ class GridWorld(object):
     # initialize action probability to 0.
     epsilon = 0.0
 
+    # position of the current grid in grids, -1 if loaded from elsewhere.
+    index = 0
+
     # define block types in the grid.
     START = 1
     GOAL = 2
@@ -81,6 +87,9 @@ class GridWorld(object):
             Actions.UP: (-1, 0),
             Actions.DOWN: (1, 0),
         }
+
+        # map each move back to its action (see get_action).
+        self.moves = dict((move, action) for action, move in self.actions.items())
         
     def initialize_grid(self, grid=None):
         """
@@ -91,9 +100,19 @@ class GridWorld(object):
         """
         # use grid if provided else self.grid[0].
         grid = grid or self.grids[0]
+        self.index = list(self.grids).index(grid) if grid in self.grids else -1
     
         # read grid representation from text file.
-        self.grid = np.loadtxt(grid, dtype=int)
+        self.set_grid(np.loadtxt(grid, dtype=int))
+
+    def set_grid(self, grid):
+        """
+        Set grid representation, and derive start, goal and distances from it.
+
+        Args:
+            grid (numpy.Array): 2D array representing the grid.
+        """
+        self.grid = grid
         self.size = self.grid.size
         self.dimensions = self.grid.shape
 
@@ -104,6 +123,42 @@ class GridWorld(object):
         # intialize current state to start position.
         self.state = self.start
 
+        # cache distance to goal for every position on the new grid.
+        self.distances = self.compute_distances()
+
+    def compute_distances(self):
+        """
+        Compute the shortest number of steps from every position on the grid to the goal.
+
+        Runs a breadth first search outwards from the goal, expanding the whole frontier
+        at once on each step.
+
+        Returns:
+            numpy.Array: 2D array of distances. Blocked positions and positions the goal
+                         can't be reached from are set to inf.
+        """
+        open_cells = self.grid != self.BLOCKED
+
+        distances = np.full(self.dimensions, np.inf)
+        distances[self.goal] = 0
+
+        frontier = np.zeros(self.dimensions, dtype=bool)
+        frontier[self.goal] = True
+
+        distance = 0
+        while frontier.any():
+            distance += 1
+
+            # positions one step up, down, left or right of the frontier.
+            padded = np.pad(frontier, 1, 'constant')
+            frontier = (
+                padded[:-2, 1:-1] | padded[2:, 1:-1] | padded[1:-1, :-2] | padded[1:-1, 2:]
+            ) & open_cells & np.isinf(distances)
+
+            distances[frontier] = distance
+
+        return distances
+
     def update_grid(self, grid=None):
         """
         Update grid.
@@ -140,6 +195,57 @@ class GridWorld(object):
 
         return valid_actions
 
+    def simulate(self, state, action):
+        """
+        Get the state reached by taking an action, without moving the agent.
+
+        Args:
+            state (tuple): (x, y) coordinates representing current position of agent.
+            action (Actions): Enum representing the action taken.
+
+        Returns:
+            tuple: (x, y) coordinates representing future position of agent.
+        """
+        return tuple(map(sum, zip(state, self.actions[action])))
+
+    def get_reward(self, state, new_state):
+        """
+        Get reward for moving from one state to another, without any shaping.
+
+        Args:
+            state (tuple): (x, y) coordinates representing current position of agent.
+            new_state (tuple): (x, y) coordinates representing future position of agent.
+
+        Returns:
+            float: 1.0 for moving into the goal, 0.0 otherwise.
+        """
+        return 1.0 if new_state == self.goal else 0.0
+
+    def is_done(self, state):
+        """
+        Determine whether an episode ends once the agent reaches a state.
+
+        Args:
+            state (tuple): (x, y) coordinates representing position of agent.
+
+        Returns:
+            bool: True if the state is the goal, False otherwise.
+        """
+        return state == self.goal
+
+    def get_action(self, state, new_state):
+        """
+        Given two adjacent states, get the action that moves from one to the other.
+
+        Args:
+            state (tuple): (x, y) coordinates representing current position of agent.
+            new_state (tuple): (x, y) coordinates representing future position of agent.
+
+        Returns:
+            Actions: Enum representing the action taken, None if the states are not adjacent.
+        """
+        return self.moves.get(tuple(new - old for old, new in zip(state, new_state)))
+
     def is_valid(self, state):
         """
         Determine whether given state is valid for the current GridWorld object.
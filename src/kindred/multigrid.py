@@ -0,0 +1,182 @@
+import numpy as np
+
+from gridworld import GridWorld
+
+
+def coarsen(grid, goal, factor=2):
+    """
+    Build a coarser grid by aggregating blocks of factor X factor cells.
+
+    A coarse cell is blocked only if every cell in its block is blocked, and the goal
+    is moved to the block containing it.
+
+    Args:
+        grid (numpy.Array): 2D array representing the grid (see GridWorld).
+        goal (tuple): (x, y) coordinates of the goal on grid.
+        factor (int): Number of rows/cols aggregated into a single coarse cell.
+
+    Returns:
+        tuple[numpy.Array, tuple]: 2D array representing the coarse grid and (x, y)
+                                   coordinates of the goal on the coarse grid.
+    """
+    rows, cols = grid.shape
+    coarse_rows = -(-rows // factor)
+    coarse_cols = -(-cols // factor)
+
+    # pad grid with blocked cells so that it divides evenly into blocks.
+    padded = np.full((coarse_rows * factor, coarse_cols * factor), GridWorld.BLOCKED, dtype=int)
+    padded[:rows, :cols] = grid
+
+    blocked = (padded == GridWorld.BLOCKED).reshape(coarse_rows, factor, coarse_cols, factor)
+    coarse = np.where(blocked.all(axis=(1, 3)), GridWorld.BLOCKED, 0)
+
+    coarse_goal = (goal[0] // factor, goal[1] // factor)
+    coarse[coarse_goal] = GridWorld.GOAL
+
+    return coarse, coarse_goal
+
+
+def prolongate(V, shape, factor=2):
+    """
+    Copy values of a coarse grid down to every cell of the finer grid it was built from.
+
+    Args:
+        V (numpy.Array): 2D array of values on the coarse grid.
+        shape (tuple): (rows, cols) of the finer grid.
+        factor (int): Factor used when coarsening.
+
+    Returns:
+        numpy.Array: 2D array of values on the finer grid.
+    """
+    fine = np.repeat(np.repeat(V, factor, axis=0), factor, axis=1)
+
+    return fine[:shape[0], :shape[1]]
+
+
+def value_iteration(grid, goal, gamma, V=None, tol=1e-6, max_iterations=100000):
+    """
+    Compute the optimal value of every cell of a grid.
+
+    Uses the reward of Agent.get_reward (1.0 for moving into the goal, 0.0 otherwise),
+    and treats the goal as terminal. All cells are updated at once on each iteration.
+
+    Args:
+        grid (numpy.Array): 2D array representing the grid (see GridWorld).
+        goal (tuple): (x, y) coordinates of the goal on grid.
+        gamma (float): Discount factor.
+        V (numpy.Array): Initial values. Zeros if not provided.
+        tol (float): Stop once no value changes by more than tol.
+        max_iterations (int): Maximum number of iterations.
+
+    Returns:
+        tuple[numpy.Array, int]: 2D array of values and number of iterations run.
+    """
+    blocked = grid == GridWorld.BLOCKED
+    reward = np.zeros(grid.shape)
+    reward[goal] = 1.0
+
+    V = np.zeros(grid.shape) if V is None else np.where(blocked, 0.0, V)
+    V[goal] = 0.0
+
+    for iteration in xrange(1, max_iterations + 1):
+        # value of moving into each cell, padded so that moves off the grid are never chosen.
+        backup = np.pad(
+            np.where(blocked, -np.inf, reward + gamma * V), 1, 'constant', constant_values=-np.inf,
+        )
+
+        # best value over moving up, down, left and right.
+        new_V = np.maximum(
+            np.maximum(backup[:-2, 1:-1], backup[2:, 1:-1]),
+            np.maximum(backup[1:-1, :-2], backup[1:-1, 2:]),
+        )
+        new_V[np.isinf(new_V) | blocked] = 0.0
+        new_V[goal] = 0.0
+
+        change = np.abs(new_V - V).max()
+        V = new_V
+        if change <= tol:
+            break
+
+    return V, iteration
+
+
+def solve_multigrid(grid, goal, gamma, levels=3, factor=2, sweeps=8, tol=1e-6):
+    """
+    Compute cell values by solving coarsened grids first and refining the result.
+
+    The coarsest grid is solved to convergence, and each finer level starts from the
+    prolongated values of the level above it. A move on a coarse grid spans factor
+    cells of the finer grid, so coarse levels are discounted accordingly.
+
+    Args:
+        grid (numpy.Array): 2D array representing the grid (see GridWorld).
+        goal (tuple): (x, y) coordinates of the goal on grid.
+        gamma (float): Discount factor.
+        levels (int): Number of coarse levels to build above grid.
+        factor (int): Number of rows/cols aggregated into a cell at each level.
+        sweeps (int): Maximum number of iterations run on each level below the coarsest.
+                      If None, every level is solved to convergence.
+        tol (float): Convergence tolerance.
+
+    Returns:
+        tuple[numpy.Array, list[int]]: 2D array of values on grid, and number of iterations
+                                       spent on each level from coarsest to finest.
+    """
+    # build hierarchy of grids from finest to coarsest.
+    hierarchy = [(grid, goal)]
+    for _ in xrange(levels):
+        hierarchy.append(coarsen(*hierarchy[-1], factor=factor))
+
+    V = None
+    iterations = []
+    for level in reversed(xrange(len(hierarchy))):
+        cells, cells_goal = hierarchy[level]
+
+        max_iterations = 100000
+        if V is not None:
+            V = prolongate(V, cells.shape, factor)
+            max_iterations = sweeps or max_iterations
+
+        V, count = value_iteration(
+            cells, cells_goal, gamma ** (factor ** level), V=V, tol=tol, max_iterations=max_iterations,
+        )
+        iterations.append(count)
+
+    return V, iterations
+
+
+def get_initial_Q(agent, V):
+    """
+    Build a Q matrix for an agent from cell values.
+
+    Args:
+        agent (Agent): Agent whose grid V was computed for.
+        V (numpy.Array): 2D array of values for every cell of the agent's grid.
+
+    Returns:
+        numpy.Array: 2D array with Q(state, new_state) = reward + gamma * V(new_state)
+                     for every valid transition out of a state other than the goal, zeros
+                     elsewhere. If the agent shapes its rewards, the potential of state is
+                     subtracted to match.
+    """
+    grid = agent.grid
+    rows = grid.dimensions[0]
+    Q = np.zeros((grid.size, grid.size), dtype=agent.dtype)
+
+    # linear indices are column major (see Agent.get_linear_index).
+    states, actions = np.nonzero(agent.neighbours >= 0)
+
+    # the goal is terminal, so transitions out of it keep a value of 0 as in value_iteration.
+    not_goal = states != agent.get_linear_index(grid.goal)
+    states, actions = states[not_goal], actions[not_goal]
+    new_states = agent.neighbours[states, actions]
+
+    value = agent.gamma * V.ravel(order='F')[new_states]
+    value[new_states == agent.get_linear_index(grid.goal)] += 1.0
+
+    if agent.shaping:
+        value -= np.array([agent.get_potential((state % rows, state // rows)) for state in states])
+
+    Q[states, new_states] = value
+
+    return Q
@@ -0,0 +1,218 @@
+import time
+from multiprocessing import Pipe, Process
+
+import numpy as np
+
+from agent import Agent
+from qlearning import SharedState, async_helper
+
+
+class AsyncLearner(object):
+    """
+    Pool of long-lived agents for running multiprocessing based Q Learning repeatedly.
+
+    learn_async starts a new process, Agent and GridWorld per agent and tears them down
+    at the end of every call. AsyncLearner starts them once, and keeps them (and the
+    shared global Q matrix) alive between runs. Every worker listens on its own pipe for
+    one of the following commands:
+
+        ('learn', kwargs): Run async_helper with the given arguments, then reply 'done'.
+        ('reset', None): Reload the agent's grid(s), then reply 'done'.
+        ('stop', None): Exit the worker.
+
+    If a command fails, the worker replies with the exception instead, which is raised
+    by wait once every worker has replied.
+
+    Time spent starting the pool and time spent in each run are kept in startup_time
+    and learn_times, and the I_async_update last chosen by each adaptive agent is kept
+    in intervals.
+    """
+
+    # initialize timings.
+    startup_time = 0.0
+    learn_times = ()
+
+    # initialize intervals chosen in the last adaptive run.
+    intervals = ()
+
+    def __init__(self, num_agents, size, grids=None, dtype=np.float64, bits=None):
+        """
+        Args:
+            num_agents (int): Number of agents to spawn (controls number of processes).
+            size (int): Size of grid (rows * cols).
+            grids (list[str|File]): List of files containing representation of grids.
+            dtype (numpy.dtype): Type of the Q values learned and exchanged.
+            bits (int): If provided, exchange the global Q matrix quantized to 8 or 16 bits
+                        per value (see qlearning.SharedState).
+
+        Returns:
+            No explicit return value.
+        """
+        start = time.time()
+
+        self.num_agents = num_agents
+
+        # intialize shared state object representing global Q matrix, and global step count T.
+        self.shared_state = SharedState(size, dtype=dtype, bits=bits)
+
+        self.channels = []
+        self.procs = []
+        for worker in xrange(num_agents):
+            channel, worker_channel = Pipe()
+            proc = Process(
+                target=pool_helper,
+                args=(self.shared_state, worker_channel, worker, grids,),
+            )
+            proc.daemon = True
+            proc.start()
+
+            # only the worker holds its end, so that recv fails if the worker exits.
+            worker_channel.close()
+
+            self.channels.append(channel)
+            self.procs.append(proc)
+
+        # wait until every agent has set up its grid.
+        try:
+            self.wait()
+        except Exception:
+            self.close()
+            raise
+
+        self.startup_time = time.time() - start
+        self.learn_times = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def send(self, command, args=None):
+        """
+        Send a command to every worker and wait until all of them are done.
+
+        Args:
+            command (str): One of 'learn', 'reset' or 'stop'.
+            args (list[dict]): Arguments for each worker. Defaults to None for all.
+        """
+        args = args or [None] * self.num_agents
+        for channel, worker_args in zip(self.channels, args):
+            channel.send((command, worker_args))
+
+        if command != 'stop':
+            self.wait()
+
+    def wait(self):
+        """
+        Wait for a reply from every worker.
+
+        Raises:
+            Exception: The first exception raised by a worker. Replies from every other
+                       worker are collected first, so the pool can still be used or closed.
+        """
+        errors = []
+        for channel in self.channels:
+            try:
+                reply = channel.recv()
+            except EOFError:
+                reply = EOFError('Worker exited without replying.')
+
+            if isinstance(reply, Exception):
+                errors.append(reply)
+
+        if errors:
+            raise errors[0]
+
+    def learn(
+        self, I_async_update, T_max, epsilon, alpha, gamma, adaptive=False, I_bounds=(1, 100),
+        max_wait=0.1, max_delta=0.1,
+    ):
+        """
+        Run multiprocessing based Q Learning on the pool, starting from a zero Q matrix.
+
+        Args:
+            I_async_update (int): Number of steps after which to update global state.
+            T_max (int): Maximum number of steps to be taken globally.
+            epsilon (float): Parameter to control the epsilon greedy policy.
+            alpha (float): Learning parameter.
+            gamma (float): Discount factor.
+            adaptive (bool): If True, each agent tunes its own I_async_update (see
+                             qlearning.learn_async).
+            I_bounds (tuple[int, int]): Lower and upper bounds for the adaptive I_async_update.
+            max_wait (float): Lock wait fraction above which the adaptive interval increases.
+            max_delta (float): Delta entry above which the adaptive interval decreases.
+
+        Returns:
+            numpy.Array: 2D array representing the learned Q matrix.
+        """
+        start = time.time()
+
+        self.shared_state.reset()
+        self.send('learn', [
+            dict(
+                I_async_update=I_async_update, T_max=T_max, epsilon=epsilon, alpha=alpha,
+                gamma=gamma, worker=worker, adaptive=adaptive, I_bounds=I_bounds,
+                max_wait=max_wait, max_delta=max_delta,
+            )
+            for worker in xrange(self.num_agents)
+        ])
+        Q = self.shared_state.get_Q()
+
+        self.learn_times.append(time.time() - start)
+        self.intervals = self.shared_state.get_intervals()
+
+        return Q
+
+    def reset(self):
+        """ Reload grids of every agent, e.g. after the grid files have changed. """
+        self.send('reset')
+
+    def close(self):
+        """ Stop every worker. """
+        for channel in self.channels:
+            try:
+                channel.send(('stop', None))
+            except (IOError, OSError):
+                # worker has already exited.
+                pass
+
+        for proc in self.procs:
+            proc.join()
+
+
+def pool_helper(shared_state, channel, worker, grids=None):
+    """
+    Helper function running a single worker of an AsyncLearner.
+
+    Args:
+        shared_state (SharedState): Shared state object representing global Q and T values.
+        channel (Connection): Pipe to receive commands on and reply to.
+        worker (int): Index of this agent.
+        grids (list[str|File]): List of files containing representation of grids.
+    """
+    # intialize state and setup grid once for all runs.
+    try:
+        agent = Agent(0.0, 0.0, 0.0, grids=grids, dtype=shared_state.dtype)
+    except Exception as error:
+        channel.send(error)
+        return
+
+    channel.send('ready')
+
+    while True:
+        command, args = channel.recv()
+
+        if command == 'stop':
+            break
+
+        # send errors back as the reply, and keep listening for commands.
+        try:
+            if command == 'learn':
+                async_helper(shared_state, agent=agent, **args)
+            elif command == 'reset':
+                agent = Agent(0.0, 0.0, 0.0, grids=grids, dtype=shared_state.dtype)
+        except Exception as error:
+            channel.send(error)
+        else:
+            channel.send('done')
@@ -1,29 +1,58 @@
+import os
+import time
+from contextlib import contextmanager
 from multiprocessing import Array, Lock, Manager, Pool, Process, Value 
 
 import numpy as np
 
 from agent import Agent
 from gridworld import GridWorld
+from multigrid import get_initial_Q, solve_multigrid
+from snapshot import INT_TYPES, dequantize, quantize
+from trajectory import TrajectoryRecorder
 
 
 class SharedState(object):
     """ Class representing global Q matrix and T values. """
-    def __init__(self, size):
+    def __init__(self, size, dtype=np.float64, bits=None):
         """
         Initialize Q matrix and T.
 
         Args:
             size (int): Size of grid (rows * cols).
+            dtype (numpy.dtype): Type of Q values stored and returned by get_Q.
+            bits (int): If provided, store Q quantized to 8 or 16 bits per value with one
+                        scale per row (see snapshot.quantize), instead of as dtype.
         """
         manager = Manager()
 
-        # internally represent Q matrix as a list of lists (in ProxyArray form).
-        self.global_Q = manager.list(np.zeros((size, size)).tolist())
+        self.size = size
+        self.dtype = dtype
+        self.bits = bits
+
+        # internally represent Q matrix as a list of encoded rows (in ProxyArray form).
+        self.global_Q = manager.list(self.encode(np.zeros((size, size), dtype=dtype)))
         self.T = Value('i', 0)
         
-        # intialize multiprocessing lock.
+        # sync interval chosen by each worker (reported by adaptive mode).
+        self.intervals = manager.dict()
+
+        # intialize multiprocessing lock guarding the global Q matrix. T is guarded by
+        # its own lock (see get_T), so that counting steps doesn't contend with syncs.
         self.lock = Lock()
 
+        # time spent waiting to acquire the Q lock. Every worker process holds its
+        # own copy of this object, so this is tracked per worker.
+        self.wait_time = 0.0
+
+    @contextmanager
+    def locked(self):
+        """ Acquire the lock, accumulating time spent waiting for it in self.wait_time. """
+        start = time.time()
+        with self.lock:
+            self.wait_time += time.time() - start
+            yield
+
     def get_Q(self):
         """
         Get global Q matrix.
@@ -31,9 +60,11 @@ class SharedState(object):
         Returns:
             numpy.Array: Global Q matrix.
         """
-        with self.lock:
-            # convert list of lists to numpy.Array.
-            return np.array(self.global_Q)
+        with self.locked():
+            # fetch all rows at once.
+            rows = self.global_Q[:]
+
+        return self.decode(rows)
     
     def update_Q(self, new_Q):
         """
@@ -42,11 +73,69 @@ class SharedState(object):
         Args:
             new_Q (numpy.Array): Updated global Q matrix.
         """
-        new_Q = new_Q.tolist()
+        rows = self.encode(new_Q)
 
-        with self.lock:
-            for i in xrange(len(self.global_Q)):    
-                self.global_Q[i] = new_Q[i]
+        with self.locked():
+            self.global_Q[:] = rows
+
+    def encode(self, Q):
+        """
+        Encode Q matrix into the rows stored in self.global_Q.
+
+        Quantized rows are rounded stochastically, so that small updates pushed by the
+        workers are not lost to rounding on average.
+
+        Args:
+            Q (numpy.Array): 2D array representing Q matrix.
+
+        Returns:
+            list: Raw bytes of each row, preceded by its scale if quantized.
+        """
+        if self.bits:
+            values, scales = quantize(Q, self.bits, stochastic=True)
+            return [(float(scale), row.tobytes()) for scale, row in zip(scales, values)]
+
+        return [row.tobytes() for row in Q.astype(self.dtype)]
+
+    def decode(self, rows):
+        """
+        Decode rows stored in self.global_Q into a Q matrix.
+
+        Args:
+            rows (list): Rows returned by encode.
+
+        Returns:
+            numpy.Array: 2D array representing Q matrix.
+        """
+        if self.bits:
+            scales = np.array([scale for scale, _ in rows], dtype=np.float32)
+            values = np.frombuffer(b''.join(row for _, row in rows), dtype=INT_TYPES[self.bits])
+            return dequantize(values.reshape(len(rows), -1), scales, dtype=self.dtype)
+
+        return np.frombuffer(b''.join(rows), dtype=self.dtype).reshape(len(rows), -1).copy()
+
+    def reset(self):
+        """ Reset global Q matrix to zeros and global T value to 0. """
+        rows = self.encode(np.zeros((self.size, self.size), dtype=self.dtype))
+
+        with self.locked():
+            self.global_Q[:] = rows
+
+            self.intervals.clear()
+
+        with self.T.get_lock():
+            self.T.value = 0
+
+    def get_intervals(self):
+        """
+        Get the I_async_update last chosen by each adaptive worker.
+
+        Returns:
+            list[int]: Interval of each worker, ordered by worker index.
+        """
+        intervals = dict(self.intervals.items())
+
+        return [intervals[worker] for worker in sorted(intervals)]
 
     def get_T(self):
         """
@@ -55,16 +144,70 @@ class SharedState(object):
         Returns:
             int: Global T value.
         """
-        with self.lock:
+        with self.T.get_lock():
             return self.T.value
 
     def increment_T(self): 
         """ Increment global T value. """
-        with self.lock:
+        with self.T.get_lock():
             self.T.value += 1
+
+
+class AdaptiveInterval(object):
+    """
+    Tunes the number of steps between global Q updates for a single worker.
+
+    After every sync the worker reports the fraction of time it spent waiting on the
+    shared lock (contention) and the largest entry of the delta it pushed (staleness).
+    A large delta halves the interval so that workers stop learning from a stale
+    global Q, heavy contention doubles it, and otherwise the interval grows by one
+    step while the deltas stay small.
+    """
+    def __init__(self, interval, min_interval=1, max_interval=100, max_wait=0.1, max_delta=0.1):
+        """
+        Args:
+            interval (int): Initial number of steps between global Q updates.
+            min_interval (int): Lower bound for the interval.
+            max_interval (int): Upper bound for the interval.
+            max_wait (float): Fraction of time spent waiting on the lock above which
+                              the interval is increased.
+            max_delta (float): Largest delta entry above which the interval is decreased.
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_wait = max_wait
+        self.max_delta = max_delta
+        self.interval = self.clip(interval)
+
+    def clip(self, interval):
+        """ Restrict interval to [self.min_interval, self.max_interval]. """
+        return int(max(self.min_interval, min(self.max_interval, interval)))
+
+    def update(self, wait_fraction, delta):
+        """
+        Choose the next interval based on measurements since the last sync.
+
+        Args:
+            wait_fraction (float): Fraction of time spent waiting on the shared lock.
+            delta (float): Largest absolute entry of the delta pushed to global Q.
+
+        Returns:
+            int: Number of steps until the next global Q update.
+        """
+        if delta > self.max_delta:
+            self.interval = self.clip(self.interval // 2)
+        elif wait_fraction > self.max_wait:
+            self.interval = self.clip(self.interval * 2)
+        elif delta < self.max_delta / 4:
+            self.interval = self.clip(self.interval + 1)
+
+        return self.interval
             
 
-def learn(num_episodes, epsilon, alpha, gamma, grids=None):
+def learn(
+    num_episodes, epsilon, alpha, gamma, grids=None, recorder=None, multigrid_levels=0, shaping=0.0,
+    env=None, dtype=np.float64,
+):
     """
     Run greedy epsilon based Q Learning.
 
@@ -74,13 +217,26 @@ def learn(num_episodes, epsilon, alpha, gamma, grids=None):
         alpha (float): Learning parameter.
         gamma (float): Discount factor.
         grids (list[str|File]): List of files containing representation of grids.
+        recorder (TrajectoryRecorder): If provided, every transition is appended to its log.
+        multigrid_levels (int): If set, initialize the Q matrix from values solved on this
+                                many coarsened versions of the grid (see multigrid).
+        shaping (float): Weight of the distance based reward shaping term (see
+                         Agent.get_potential). Disabled if 0.
+        env (GridWorld): Grid to learn on instead of loading grids, e.g. a
+                         remote.RemoteGridWorld backed by an environment server.
+        dtype (numpy.dtype): Type of the Q values learned, e.g. numpy.float32.
 
     Returns:
         (int, numpy.Array): Integer specifying number of steps and 2D array representing
 							the learned Q matrix. 
     """
     # intialize state and setup grid.
-    agent = Agent(epsilon, alpha, gamma, grids=grids)
+    agent = Agent(epsilon, alpha, gamma, grids=grids, shaping=shaping, grid=env, dtype=dtype)
+
+    # propagate goal reward through coarse grids before learning on the full grid.
+    if multigrid_levels:
+        V, _ = solve_multigrid(agent.grid.grid, agent.grid.goal, gamma, levels=multigrid_levels)
+        agent.Q = get_initial_Q(agent, V)
 
     # repeat for each episode:
     for i in xrange(num_episodes):
@@ -88,31 +244,55 @@ def learn(num_episodes, epsilon, alpha, gamma, grids=None):
         agent.state = agent.grid.start
 
         # step through until the agent reaches goal.
-        while agent.state != agent.grid.goal:
+        while not agent.grid.is_done(agent.state):
             current_state = agent.state
 
             # simulates the agent's next step using greedy epsilon policy.
             new_state, reward = agent.simulate_action()
-        	
-            # get Q value from the agent's Q matrix.
-            current_value = agent.get_Q(current_state, new_state)
-
-            # get future value based on simulated next state of the agent.
-            _, future_value = agent.argmax(new_state)
 
-            # calculate new Q value based on the update rule.
-            expected_reward = current_value + alpha * (reward + (gamma * future_value) - current_value)
+            if recorder is not None:
+                recorder.record_step(agent, current_state, new_state)
 
-            # update agent's Q matrix with the calculated value.
-            agent.update_Q(current_state, new_state, expected_reward)
+            learn_step(agent, current_state, new_state, reward, alpha, gamma)
 
-            # update agent's state to new state.
-            agent.state = new_state
+    if recorder is not None:
+        recorder.flush()
 
     return (agent.steps, agent.Q)
 
 
-def learn_async(num_agents, I_async_update, T_max, size, epsilon, alpha, gamma):
+def learn_step(agent, current_state, new_state, reward, alpha, gamma):
+    """
+    Apply the Q Learning update rule for a single step, and move the agent.
+
+    Args:
+        agent (Agent): Agent that took the step.
+        current_state (tuple): (x, y) coordinates representing previous position of agent.
+        new_state (tuple): (x, y) coordinates representing new position of agent.
+        reward (float): Reward received for the step.
+        alpha (float): Learning parameter.
+        gamma (float): Discount factor.
+    """
+    # get Q value from the agent's Q matrix.
+    current_value = agent.get_Q(current_state, new_state)
+
+    # get future value based on simulated next state of the agent.
+    _, future_value = agent.argmax(new_state)
+
+    # calculate new Q value based on the update rule.
+    expected_reward = current_value + alpha * (reward + (gamma * future_value) - current_value)
+
+    # update agent's Q matrix with the calculated value.
+    agent.update_Q(current_state, new_state, expected_reward)
+
+    # update agent's state to new state.
+    agent.state = new_state
+
+
+def learn_async(
+    num_agents, I_async_update, T_max, size, epsilon, alpha, gamma, adaptive=False, I_bounds=(1, 100),
+    record=None, dtype=np.float64, bits=None, max_wait=0.1, max_delta=0.1, shared_state=None,
+):
     """
     Wrapper function for running multiprocessing based Q Learning.
 
@@ -124,20 +304,40 @@ def learn_async(num_agents, I_async_update, T_max, size, epsilon, alpha, gamma):
         epsilon (float): Parameter to control the epsilon greedy policy.
         alpha (float): Learning parameter.
         gamma (float): Discount factor.
+        adaptive (bool): If True, each agent tunes its own I_async_update based on lock
+                         contention and the size of its local delta.
+        I_bounds (tuple[int, int]): Lower and upper bounds for the adaptive I_async_update.
+        record (str): If provided, directory under which each agent logs its transitions
+                      (see get_record_paths).
+        dtype (numpy.dtype): Type of the Q values learned and exchanged, e.g. numpy.float32.
+        bits (int): If provided, exchange the global Q matrix quantized to 8 or 16 bits per
+                    value (see SharedState).
+        max_wait (float): Fraction of time spent waiting on the lock above which adaptive
+                          agents increase I_async_update (see AdaptiveInterval).
+        max_delta (float): Largest delta entry above which adaptive agents decrease
+                           I_async_update (see AdaptiveInterval).
+        shared_state (SharedState): Shared state to learn into, e.g. to read the intervals
+                                    chosen by adaptive agents with get_intervals once done.
+                                    Created from size, dtype and bits if not provided.
 
     Returns:
-        numpy.Array: 2D array representing the learned Q matrix. 
+        numpy.Array: 2D array representing the learned Q matrix.
     """
     # intialize shared state object representing global Q matrix, and global step count T.
-    shared_state = SharedState(size)
+    if shared_state is None:
+        shared_state = SharedState(size, dtype=dtype, bits=bits)
 
     # intialize processes equal to num_agents.
     procs = [
         Process(
             target=async_helper,
-            args=(shared_state, I_async_update, T_max, epsilon, alpha, gamma,),
+            args=(
+                shared_state, I_async_update, T_max, epsilon, alpha, gamma, worker, adaptive, I_bounds,
+                get_record_paths(record, num_agents)[worker] if record else None,
+            ),
+            kwargs=dict(max_wait=max_wait, max_delta=max_delta),
         )
-        for _ in xrange(num_agents)    
+        for worker in xrange(num_agents)    
     ]
     
     for proc in procs: proc.start()
@@ -146,7 +346,24 @@ def learn_async(num_agents, I_async_update, T_max, size, epsilon, alpha, gamma):
     return shared_state.get_Q()
 
 
-def async_helper(shared_state, I_async_update, T_max, epsilon, alpha, gamma):
+def get_record_paths(record, num_agents):
+    """
+    Get directories holding the transitions logged by each agent of learn_async.
+
+    Args:
+        record (str): Directory passed to learn_async.
+        num_agents (int): Number of agents.
+
+    Returns:
+        list[str]: One log directory per agent, to be read by trajectory.learn_offline.
+    """
+    return [os.path.join(record, 'agent_{}'.format(worker)) for worker in xrange(num_agents)]
+
+
+def async_helper(
+    shared_state, I_async_update, T_max, epsilon, alpha, gamma, worker=0, adaptive=False, I_bounds=(1, 100),
+    record=None, agent=None, max_wait=0.1, max_delta=0.1,
+):
     """
     Helper function for running multiprocessing based Q Learning.
 
@@ -158,12 +375,37 @@ def async_helper(shared_state, I_async_update, T_max, epsilon, alpha, gamma):
         epsilon (float): Parameter to control the epsilon greedy policy.
         alpha (float): Learning parameter.
         gamma (float): Discount factor.
+        worker (int): Index of this agent, used to report its I_async_update.
+        adaptive (bool): If True, tune I_async_update after every global update, and only
+                         update global Q every I_async_update steps rather than also at
+                         the end of every episode.
+        I_bounds (tuple[int, int]): Lower and upper bounds for the adaptive I_async_update.
+        record (str): If provided, directory to log this agent's transitions to.
+        agent (Agent): If provided, reset and reuse this agent instead of creating one.
+        max_wait (float): Lock wait fraction above which the adaptive interval increases.
+        max_delta (float): Delta entry above which the adaptive interval decreases.
     """
     # intialize state and setup grid.
-    agent = Agent(epsilon, alpha, gamma)
+    if agent is None:
+        agent = Agent(epsilon, alpha, gamma, dtype=shared_state.dtype)
+    else:
+        agent.reset(epsilon, alpha, gamma)
+
+    # setup transition log.
+    recorder = TrajectoryRecorder(record) if record else None
      
     # get global Q matrix.
     global_Q = shared_state.get_Q()    
+
+    # setup interval controller and measurements since the last global update.
+    if adaptive:
+        controller = AdaptiveInterval(I_async_update, I_bounds[0], I_bounds[1], max_wait, max_delta)
+        I_async_update = controller.interval
+        shared_state.intervals[worker] = I_async_update
+
+    steps_since_update = 0
+    last_update = time.time()
+    shared_state.wait_time = 0.0
     
     # step through until the global T value reaches T_max.
     while shared_state.get_T() < T_max:
@@ -173,6 +415,9 @@ def async_helper(shared_state, I_async_update, T_max, epsilon, alpha, gamma):
         # simulates the agent's next step using greedy epsilon policy.
         new_state, reward = agent.simulate_action(global_Q)
 
+        if recorder is not None:
+            recorder.record_step(agent, current_state, new_state)
+
         # get future value based on simulated next state of the agent.
         _, future_value = agent.argmax(new_state, global_Q)
 
@@ -193,12 +438,37 @@ def async_helper(shared_state, I_async_update, T_max, epsilon, alpha, gamma):
 
         # increment global T value.
         shared_state.increment_T()
+        steps_since_update += 1
+
+        # in adaptive mode count steps since the last update, as the interval changes.
+        # Reaching the goal doesn't force an update there, otherwise short episodes
+        # would set the update rate (and lock contention) regardless of the interval.
+        if adaptive:
+            sync_due = steps_since_update >= I_async_update
+        else:
+            sync_due = agent.steps % I_async_update == 0 or (agent.state == agent.grid.goal)
 
         # update global Q value.
-        if (agent.steps % I_async_update == 0) or (agent.state == agent.grid.goal):
+        if sync_due:
             # update global Q matrix with discounted local copy of agent's Q matrix.
-            global_Q = np.add(shared_state.get_Q(), alpha * agent.Q)
+            delta = alpha * agent.Q
+            global_Q = np.add(shared_state.get_Q(), delta)
             shared_state.update_Q(global_Q)
 
             # reset local Q matrix to zeros.
             agent.reset_Q()
+
+            if adaptive:
+                # tune interval based on lock contention and size of the pushed delta.
+                now = time.time()
+                wait_fraction = shared_state.wait_time / max(now - last_update, 1e-9)
+                I_async_update = controller.update(wait_fraction, np.abs(delta).max())
+                shared_state.intervals[worker] = I_async_update
+
+                last_update = now
+                shared_state.wait_time = 0.0
+
+            steps_since_update = 0
+
+    if recorder is not None:
+        recorder.close()
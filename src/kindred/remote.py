@@ -0,0 +1,435 @@
+import json
+import socket
+import threading
+import time
+from collections import deque
+from Queue import Queue
+from SocketServer import StreamRequestHandler, ThreadingTCPServer
+
+import numpy as np
+
+from agent import Agent
+from gridworld import Actions, GridWorld
+from qlearning import learn_step
+
+
+class EnvironmentServer(ThreadingTCPServer):
+    """
+    Serves GridWorld transitions over TCP.
+
+    Requests and replies are JSON objects, one per line. Every request carries an id
+    which is copied to its reply, and replies are sent in the order requests arrive, so
+    a client may send many requests before reading any reply. The server keeps no
+    position for any agent, so one connection can serve any number of agents:
+
+        {"op": "info"} -> {"grids": number of grids}
+        {"op": "layout", "grid": i} -> {"grid": 2D list representing grid i}
+        {"op": "reset", "grids": [i, ...]} -> {"states": start of each grid}
+        {"op": "step", "grids": [i, ...], "states": [[x, y], ...], "actions": [a, ...]}
+            -> {"states": [[x, y], ...], "rewards": [r, ...], "done": [bool, ...]}
+
+    Actions are sent as the value of the Actions enum, and invalid actions leave the
+    state unchanged.
+    """
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address=('localhost', 0), grids=None, latency=0.0):
+        """
+        Args:
+            address (tuple): (host, port) to listen on. Port 0 picks a free port.
+            grids (list[str|File]): List of files containing representation of grids.
+            latency (float): Seconds to delay every reply by, to stand in for a network.
+
+        Returns:
+            No explicit return value.
+        """
+        self.worlds = [GridWorld(grids=[grid]) for grid in (grids or GridWorld.grids)]
+        self.latency = latency
+
+        ThreadingTCPServer.__init__(self, address, EnvironmentHandler)
+
+    def start(self):
+        """
+        Serve requests on a background thread.
+
+        Returns:
+            EnvironmentServer: This server.
+        """
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        return self
+
+    def stop(self):
+        """ Stop serving requests and release the socket. """
+        self.shutdown()
+        self.server_close()
+
+    def respond(self, request):
+        """
+        Build the reply to a single request.
+
+        Args:
+            request (dict): Decoded request.
+
+        Returns:
+            dict: Reply to be encoded, without its id.
+        """
+        op = request['op']
+
+        if op == 'info':
+            return {'grids': len(self.worlds)}
+        elif op == 'layout':
+            return {'grid': self.worlds[request['grid']].grid.tolist()}
+        elif op == 'reset':
+            return {'states': [self.worlds[grid].start for grid in request['grids']]}
+        elif op == 'step':
+            reply = {'states': [], 'rewards': [], 'done': []}
+            for grid, state, action in zip(request['grids'], request['states'], request['actions']):
+                world = self.worlds[grid]
+
+                new_state = world.simulate(tuple(state), Actions(action))
+                if not world.is_valid(new_state):
+                    new_state = tuple(state)
+
+                reply['states'].append(new_state)
+                reply['rewards'].append(1.0 if new_state == world.goal else 0.0)
+                reply['done'].append(new_state == world.goal)
+
+            return reply
+
+        return {'error': 'Unknown op: {}'.format(op)}
+
+
+class EnvironmentHandler(StreamRequestHandler):
+    """ Handles a single client connection of an EnvironmentServer. """
+
+    def handle(self):
+        # replies are written by a separate thread, so that reading requests is never
+        # held up by the latency of earlier replies.
+        replies = Queue()
+        writer = threading.Thread(target=self.write, args=(replies,))
+        writer.daemon = True
+        writer.start()
+
+        try:
+            while True:
+                line = self.rfile.readline()
+                if not line:
+                    break
+
+                request = json.loads(line)
+                try:
+                    reply = self.server.respond(request)
+                except Exception as error:
+                    # report bad requests (e.g. an unknown grid) and keep the connection open.
+                    reply = {'error': '{}: {}'.format(type(error).__name__, error)}
+                reply['id'] = request['id']
+
+                replies.put((time.time() + self.server.latency, json.dumps(reply) + '\n'))
+        finally:
+            replies.put((None, None))
+            writer.join()
+
+    def write(self, replies):
+        """
+        Send replies in order, each no earlier than its due time.
+
+        Args:
+            replies (Queue): Queue of (due time, encoded reply) tuples, ended by (None, None).
+        """
+        while True:
+            due, line = replies.get()
+            if line is None:
+                break
+
+            time.sleep(max(0.0, due - time.time()))
+            self.wfile.write(line)
+
+
+class EnvironmentClient(object):
+    """
+    Client for an EnvironmentServer.
+
+    send writes a request and returns its id without waiting for the reply, and receive
+    waits for the reply to a given id. Many requests can therefore be kept in flight on
+    a single connection.
+    """
+
+    def __init__(self, address):
+        """
+        Args:
+            address (tuple): (host, port) of the server.
+
+        Returns:
+            No explicit return value.
+        """
+        self.socket = socket.create_connection(address)
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.file = self.socket.makefile('rb')
+
+        self.next_id = 0
+        self.replies = {}
+
+    def send(self, op, **fields):
+        """
+        Send a request without waiting for its reply.
+
+        Args:
+            op (str): Operation requested (see EnvironmentServer).
+            fields (dict): Arguments of the operation.
+
+        Returns:
+            int: Id of the request, to be passed to receive.
+        """
+        request_id = self.next_id
+        self.next_id += 1
+
+        fields.update(id=request_id, op=op)
+        self.socket.sendall(json.dumps(fields) + '\n')
+
+        return request_id
+
+    def receive(self, request_id):
+        """
+        Wait for the reply to a request.
+
+        Args:
+            request_id (int): Id returned by send.
+
+        Returns:
+            dict: Decoded reply.
+        """
+        # replies arrive in order, so keep any that come before the one requested.
+        while request_id not in self.replies:
+            line = self.file.readline()
+            if not line:
+                raise IOError('Connection closed by environment server.')
+
+            reply = json.loads(line)
+            self.replies[reply['id']] = reply
+
+        reply = self.replies.pop(request_id)
+        if 'error' in reply:
+            raise ValueError(reply['error'])
+
+        return reply
+
+    def request(self, op, **fields):
+        """ Send a request and wait for its reply. """
+        return self.receive(self.send(op, **fields))
+
+    def reset(self, grids):
+        """
+        Request the start state of each of the given grids.
+
+        Args:
+            grids (list[int]): Index of the grid for each agent.
+
+        Returns:
+            int: Id of the request.
+        """
+        return self.send('reset', grids=grids)
+
+    def step(self, grids, states, actions):
+        """
+        Request the outcome of one action for each of several agents.
+
+        Args:
+            grids (list[int]): Index of the grid for each agent.
+            states (list[tuple]): (x, y) coordinates representing position of each agent.
+            actions (list[Actions]): Enum representing the action taken by each agent.
+
+        Returns:
+            int: Id of the request.
+        """
+        return self.send(
+            'step', grids=grids, states=states, actions=[action.value for action in actions],
+        )
+
+    def close(self):
+        """ Close the connection. """
+        self.file.close()
+        self.socket.close()
+
+
+class RemoteGridWorld(GridWorld):
+    """
+    GridWorld whose grids and transitions come from an EnvironmentServer.
+
+    The layout of the current grid is fetched when it is loaded, so that valid actions
+    are known locally, and every simulated step is a request to the server. The reward
+    and end of episode the server reports for the last step are used in place of the
+    local ones (see observe). Grids are referred to by their index on the server.
+    """
+
+    # last transition stepped on the server, with the reward and end of episode reported.
+    transition = None
+    reward = 0.0
+    done = False
+
+    def __init__(self, client):
+        """
+        Args:
+            client (EnvironmentClient): Connection to the server.
+
+        Returns:
+            No explicit return value.
+        """
+        self.client = client
+        self.index = 0
+
+        GridWorld.__init__(self, grids=range(client.request('info')['grids']))
+
+    def initialize_grid(self, grid=None):
+        """
+        Initialize grid.
+
+        Args:
+            grid (int): Index of the grid on the server.
+        """
+        # use grid if provided else self.grid[0].
+        self.index = self.grids[0] if grid is None else grid
+
+        self.set_grid(np.array(self.client.request('layout', grid=self.index)['grid']))
+
+    def simulate(self, state, action):
+        """
+        Get the state reached by taking an action from the server.
+
+        Args:
+            state (tuple): (x, y) coordinates representing current position of agent.
+            action (Actions): Enum representing the action taken.
+
+        Returns:
+            tuple: (x, y) coordinates representing future position of agent.
+        """
+        reply = self.client.receive(self.client.step([self.index], [state], [action]))
+
+        new_state = tuple(reply['states'][0])
+        self.observe(state, new_state, reply['rewards'][0], reply['done'][0])
+
+        return new_state
+
+    def observe(self, state, new_state, reward, done):
+        """
+        Keep the outcome of a transition stepped on the server.
+
+        Args:
+            state (tuple): (x, y) coordinates representing previous position of agent.
+            new_state (tuple): (x, y) coordinates representing new position of agent.
+            reward (float): Reward reported by the server.
+            done (bool): Whether the server ended the episode at new_state.
+        """
+        self.transition = (tuple(state), new_state)
+        self.reward = reward
+        self.done = done
+
+    def get_reward(self, state, new_state):
+        """
+        Get reward reported by the server for the last transition.
+
+        Transitions that weren't the last one stepped on the server fall back to
+        GridWorld.get_reward.
+        """
+        if self.transition == (tuple(state), tuple(new_state)):
+            return self.reward
+
+        return GridWorld.get_reward(self, state, new_state)
+
+    def is_done(self, state):
+        """
+        Determine whether the server ended the episode at a state.
+
+        States other than the one reached by the last transition fall back to
+        GridWorld.is_done.
+        """
+        if self.transition is not None and self.transition[1] == tuple(state):
+            return self.done
+
+        return GridWorld.is_done(self, state)
+
+
+def learn_remote(client, num_agents, num_episodes, epsilon, alpha, gamma, window=4, shaping=0.0):
+    """
+    Run greedy epsilon based Q Learning for many agents over one server connection.
+
+    Agents are split into window groups. Each group sends a single request with the
+    next step of all its agents, and a new request is sent as soon as the previous
+    reply of the group has been applied, so that up to window requests are in flight.
+    Agents whose episode ends are moved back to the start by a reset request, sent
+    alongside the next step of the rest of their group.
+
+    Args:
+        client (EnvironmentClient): Connection to the server.
+        num_agents (int): Number of agents, each learning its own Q matrix.
+        num_episodes (int): Number of episodes to run algorithm for, per agent.
+        epsilon (float): Parameter to control the epsilon greedy policy.
+        alpha (float): Learning parameter.
+        gamma (float): Discount factor.
+        window (int): Maximum number of step requests in flight.
+        shaping (float): Weight of the distance based reward shaping term, added locally
+                         to the reward from the server (see Agent.get_potential).
+
+    Returns:
+        list[(int, numpy.Array)]: Number of steps and learned Q matrix of each agent.
+    """
+    agents = [
+        Agent(epsilon, alpha, gamma, shaping=shaping, grid=RemoteGridWorld(client))
+        for _ in xrange(num_agents)
+    ]
+    episodes = [0] * num_agents
+
+    def send(group):
+        """ Request the next step of every unfinished agent of a group. """
+        group = [i for i in group if episodes[i] < num_episodes]
+        if group:
+            actions = [agents[i].choose_action() for i in group]
+            request_id = client.step(
+                [agents[i].grid.index for i in group], [agents[i].state for i in group], actions,
+            )
+            pending.append((request_id, 'step', group))
+
+    def reset(group):
+        """ Request the start state of every unfinished agent of a group. """
+        group = [i for i in group if episodes[i] < num_episodes]
+        if group:
+            request_id = client.reset([agents[i].grid.index for i in group])
+            pending.append((request_id, 'reset', group))
+
+    pending = deque()
+    for offset in xrange(min(window, num_agents)):
+        reset(range(offset, num_agents, window))
+
+    while pending:
+        request_id, op, group = pending.popleft()
+        reply = client.receive(request_id)
+
+        if op == 'reset':
+            # reset agent state to start position, and take the first step of the episode.
+            for i, state in zip(group, reply['states']):
+                agents[i].state = tuple(state)
+
+            send(group)
+            continue
+
+        done = []
+        for i, new_state, reward, finished in zip(group, reply['states'], reply['rewards'], reply['done']):
+            agent = agents[i]
+            state, new_state = agent.state, tuple(new_state)
+
+            agent.grid.observe(state, new_state, reward, finished)
+            learn_step(agent, state, new_state, agent.get_reward(new_state, state), alpha, gamma)
+
+            # start a new episode once the server ends this one.
+            if finished:
+                episodes[i] += 1
+                done.append(i)
+
+        send([i for i in group if i not in done])
+        reset(done)
+
+    return [(agent.steps, agent.Q) for agent in agents]
@@ -0,0 +1,111 @@
+import numpy as np
+
+
+# integer types used to store quantized Q values, by number of bits.
+INT_TYPES = {8: np.int8, 16: np.int16}
+
+
+def quantize(Q, bits=8, stochastic=False):
+    """
+    Encode a Q matrix as integers with one scale per row.
+
+    Every row is divided by its own scale, chosen so that its largest absolute value
+    maps to the largest integer of the type. Rows of zeros are kept exact.
+
+    Args:
+        Q (numpy.Array): 2D array containing Q values for state transitions.
+        bits (int): Number of bits per value, 8 or 16.
+        stochastic (bool): If True, round up or down at random with probability given by
+                           the distance to each integer, so that rounding is unbiased and
+                           updates smaller than the scale are kept on average.
+
+    Returns:
+        tuple[numpy.Array, numpy.Array]: 2D integer array of the same shape as Q, and
+                                         float32 scale of each row.
+    """
+    levels = 2 ** (bits - 1) - 1
+
+    scales = np.abs(Q).max(axis=1).astype(np.float32) / levels
+    scales[scales == 0] = 1.0
+
+    scaled = Q / scales[:, None]
+    if stochastic:
+        scaled = np.floor(scaled + np.random.rand(*Q.shape))
+    else:
+        scaled = np.round(scaled)
+
+    return (np.clip(scaled, -levels, levels).astype(INT_TYPES[bits]), scales)
+
+
+def dequantize(values, scales, dtype=np.float64):
+    """
+    Decode a Q matrix encoded by quantize.
+
+    Args:
+        values (numpy.Array): 2D integer array returned by quantize.
+        scales (numpy.Array): Scale of each row returned by quantize.
+        dtype (numpy.dtype): Type of the decoded Q values.
+
+    Returns:
+        numpy.Array: 2D array containing Q values for state transitions.
+    """
+    return values.astype(dtype) * scales.astype(dtype)[:, None]
+
+
+def save_Q(path, Q, bits=None):
+    """
+    Save a Q matrix to disk.
+
+    Args:
+        path (str|File): File to write to, in numpy .npz format.
+        Q (numpy.Array): 2D array containing Q values for state transitions.
+        bits (int): If provided, store Q quantized to 8 or 16 bits per value (see
+                    quantize). Otherwise store Q with its own type.
+    """
+    if bits:
+        values, scales = quantize(Q, bits)
+        np.savez(path, values=values, scales=scales)
+    else:
+        np.savez(path, Q=Q)
+
+
+def load_Q(path, dtype=None):
+    """
+    Load a Q matrix saved by save_Q.
+
+    Args:
+        path (str|File): File written by save_Q.
+        dtype (numpy.dtype): Type of the loaded Q values. Defaults to the type Q was saved
+                             with, or numpy.float64 for quantized files.
+
+    Returns:
+        numpy.Array: 2D array containing Q values for state transitions.
+    """
+    snapshot = np.load(path)
+
+    if 'Q' in snapshot.files:
+        Q = snapshot['Q']
+        return Q if dtype is None else Q.astype(dtype)
+
+    return dequantize(snapshot['values'], snapshot['scales'], dtype=dtype or np.float64)
+
+
+def get_policy_changes(agent, Q, other):
+    """
+    Find states where two Q matrices lead to different greedy actions.
+
+    Args:
+        agent (Agent): Agent whose grid both Q matrices were learned on.
+        Q (numpy.Array): 2D array containing Q values for state transitions.
+        other (numpy.Array): 2D array to compare with, e.g. Q after quantization.
+
+    Returns:
+        numpy.Array: Linear indices of states with at least one valid action whose greedy
+                     action differs.
+    """
+    actions, _ = agent.get_greedy_actions(Q)
+    other_actions, _ = agent.get_greedy_actions(other)
+
+    has_actions = (agent.neighbours >= 0).any(axis=1)
+
+    return np.flatnonzero(has_actions & (actions != other_actions))
@@ -0,0 +1,221 @@
+import numpy as np
+
+from agent import Agent
+from gridworld import GridWorld
+
+
+class StackedGridWorld(object):
+    """
+    Represents several GridWorld environments learned side by side.
+
+    Every environment has its own sequence of grids and the steps at which it switches
+    to the next one (GridWorld.grids switches once, at Agent.STEPS). All grids are padded
+    with blocked positions to a common shape and stacked, so that each grid is described
+    by a row of the following arrays:
+
+        transitions (numpy.Array): [grid, state, action] -> new state, -1 if not valid.
+        starts (numpy.Array): [grid] -> start state.
+        goals (numpy.Array): [grid] -> goal state.
+
+    States are linear indices into the padded grid (see Agent.get_linear_index).
+    """
+
+    # initialize empty stack.
+    grids = None
+    dimensions = ()
+    size = 0
+
+    def __init__(self, environments, schedules=None):
+        """
+        Args:
+            environments (list[list[str|File]]): List of grid sequences, one per environment.
+            schedules (list[list[int]]): Steps at which each environment switches to its
+                                         next grid. Defaults to switching once after
+                                         Agent.STEPS steps.
+
+        Returns:
+            No explicit return value.
+        """
+        worlds = [[GridWorld(grids=[grid]) for grid in grids] for grids in environments]
+
+        # define actions in the same order as an Agent.
+        self.actions = list(worlds[0][0].actions)
+
+        # number of grids (and position of each environment's first grid) in the stack.
+        self.offsets = np.cumsum([0] + [len(grids) for grids in worlds])
+        self.counts = np.array([len(grids) for grids in worlds])
+        self.schedules = schedules or [[Agent.STEPS] * (len(grids) - 1) for grids in worlds]
+
+        if len(self.schedules) != len(worlds):
+            raise ValueError('Expected one schedule per environment.')
+        for schedule, count in zip(self.schedules, self.counts):
+            if len(schedule) != count - 1:
+                raise ValueError(
+                    'Expected {} switch step(s) for an environment with {} grid(s), got {}.'.format(
+                        count - 1, count, len(schedule),
+                    )
+                )
+
+        # pad every grid to a common shape.
+        flat = [world for grids in worlds for world in grids]
+        self.dimensions = tuple(np.max([world.dimensions for world in flat], axis=0))
+        self.size = self.dimensions[0] * self.dimensions[1]
+        self.shapes = [world.dimensions for world in flat]
+
+        self.grids = np.full((len(flat),) + self.dimensions, GridWorld.BLOCKED, dtype=int)
+        for i, world in enumerate(flat):
+            self.grids[i, :world.dimensions[0], :world.dimensions[1]] = world.grid
+
+        self.starts = np.array([self.get_linear_index(world.start) for world in flat])
+        self.goals = np.array([self.get_linear_index(world.goal) for world in flat])
+        self.transitions = self.get_transitions(flat[0].actions)
+
+        # 0 for valid actions and -inf otherwise, added to Q values to mask invalid actions.
+        self.penalties = np.where(self.transitions >= 0, 0.0, -np.inf)
+
+    def get_linear_index(self, state):
+        """
+        Translate 2D coordinates on the padded grid into scalar integer index.
+
+        Args:
+            state (tuple): Tuple representing (x, y) coordinates.
+
+        Returns:
+            int: Value representing integral index into flattened array.
+        """
+        return state[0] + (self.dimensions[0] * state[1])
+
+    def get_transitions(self, moves):
+        """
+        Build the transition table of every grid in the stack.
+
+        Args:
+            moves (dict): Map of Actions to (x, y) offsets (see GridWorld.actions).
+
+        Returns:
+            numpy.Array: 3D array of shape (grids, size, actions) holding the new state
+                         for each action, or -1 where the action is not valid.
+        """
+        rows, cols = self.dimensions
+        x, y = np.meshgrid(np.arange(rows), np.arange(cols), indexing='ij')
+        open_cells = self.grids != GridWorld.BLOCKED
+
+        transitions = np.full((len(self.grids), self.size, len(self.actions)), -1, dtype=int)
+        for i, action in enumerate(self.actions):
+            new_x, new_y = x + moves[action][0], y + moves[action][1]
+            inside = (new_x >= 0) & (new_x < rows) & (new_y >= 0) & (new_y < cols)
+
+            # keep moves that start on an open cell and end on an open cell inside the grid.
+            valid = open_cells & inside
+            valid[:, inside] &= open_cells[:, new_x[inside], new_y[inside]]
+
+            grid, valid_x, valid_y = np.nonzero(valid)
+            transitions[grid, self.get_linear_index((valid_x, valid_y)), i] = self.get_linear_index(
+                (new_x[valid_x, valid_y], new_y[valid_x, valid_y])
+            )
+
+        return transitions
+
+    def get_Q(self, Q, environment):
+        """
+        Translate an environment's Q values into the Q matrix used by Agent.
+
+        Args:
+            Q (numpy.Array): 3D array of shape (environments, size, actions) returned by
+                             learn_stacked.
+            environment (int): Index of the environment.
+
+        Returns:
+            numpy.Array: 2D array containing Q values for state transitions on the
+                         environment's last grid, indexed as in Agent.get_Q.
+        """
+        grid = self.offsets[environment + 1] - 1
+        rows, cols = self.shapes[grid]
+
+        # map states of the padded grid to states of the original grid.
+        x, y = np.meshgrid(np.arange(rows), np.arange(cols), indexing='ij')
+        padded = self.get_linear_index((x, y)).ravel()
+        original = np.full(self.size, -1, dtype=int)
+        original[padded] = (x + rows * y).ravel()
+
+        states, actions = np.nonzero(self.transitions[grid] >= 0)
+        new_states = self.transitions[grid, states, actions]
+
+        dense_Q = np.zeros((rows * cols, rows * cols))
+        dense_Q[original[states], original[new_states]] = Q[environment, states, actions]
+
+        return dense_Q
+
+
+def learn_stacked(stack, num_episodes, epsilon, alpha, gamma):
+    """
+    Run greedy epsilon based Q Learning on every environment of a stack at once.
+
+    Each environment has its own Q table and follows the same update rule as learn.
+    Every iteration advances all environments by a single step, and environments that
+    have completed num_episodes keep learning until every environment has, so that each
+    iteration stays a fixed size batch update.
+
+    Args:
+        stack (StackedGridWorld): Environments to learn.
+        num_episodes (int): Minimum number of episodes to run algorithm for, per environment.
+        epsilon (float): Parameter to control the epsilon greedy policy.
+        alpha (float): Learning parameter.
+        gamma (float): Discount factor.
+
+    Returns:
+        (int, numpy.Array): Integer specifying number of steps taken by each environment and
+                            3D array of shape (environments, size, actions) representing the
+                            learned Q values (see StackedGridWorld.get_Q).
+    """
+    num_environments = len(stack.counts)
+    num_actions = len(stack.actions)
+
+    # Q values of every environment, with rows indexed by environment * size + state.
+    Q = np.zeros((num_environments * stack.size, num_actions))
+    rows = np.arange(num_environments) * stack.size
+
+    # current grid, state, step and episode count of each environment.
+    grids = stack.offsets[:-1].copy()
+    states = stack.starts[grids]
+    steps = 0
+    episodes = np.zeros(num_environments, dtype=int)
+
+    # step at which each environment next switches grids, never if past its last grid.
+    schedules = [np.append(schedule, -1) for schedule in stack.schedules]
+    switches = np.array([schedule[0] for schedule in schedules])
+
+    while episodes.min() < num_episodes:
+        # choose greedy action, or a random valid action with probability epsilon.
+        penalty = stack.penalties[grids, states]
+        greedy = (Q[rows + states] + penalty).argmax(axis=1)
+        random = (np.random.rand(num_environments, num_actions) + penalty).argmax(axis=1)
+        action = np.where(np.random.rand(num_environments) < epsilon, random, greedy)
+
+        new_states = stack.transitions[grids, states, action]
+        reward = new_states == stack.goals[grids]
+
+        # get future value based on simulated next state of each environment.
+        future_value = (Q[rows + new_states] + stack.penalties[grids, new_states]).max(axis=1)
+
+        # update Q values based on the update rule.
+        current_value = Q[rows + states, action]
+        Q[rows + states, action] = current_value + alpha * (reward + (gamma * future_value) - current_value)
+
+        steps += 1
+
+        # start a new episode in environments that reached the goal.
+        episodes += reward
+        states = np.where(reward, stack.starts[grids], new_states)
+
+        # switch grids on schedule, moving to the start of the new grid.
+        switched = np.flatnonzero(switches == steps)
+        if len(switched):
+            grids[switched] += 1
+            states[switched] = stack.starts[grids[switched]]
+            switches[switched] = [
+                schedules[environment][grids[environment] - stack.offsets[environment]]
+                for environment in switched
+            ]
+
+    return (steps, Q.reshape(num_environments, stack.size, num_actions))
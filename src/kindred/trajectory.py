@@ -0,0 +1,277 @@
+import os
+
+import numpy as np
+
+from agent import Agent
+from gridworld import GridWorld
+
+
+class TrajectoryRecorder(object):
+    """
+    Appends (state, action, reward, next_state, grid) transitions to an on-disk log.
+
+    The log is a directory of fixed size segments. Every segment stores each column
+    in its own memory-mapped binary file:
+
+        <path>/state.00000.bin
+        <path>/action.00000.bin
+        <path>/reward.00000.bin
+        <path>/next_state.00000.bin
+        <path>/grid.00000.bin
+        <path>/index.npy
+
+    States are stored as linear indices into the Q matrix (see Agent.get_linear_index),
+    actions as the value of the corresponding Actions enum, and grids as the position of
+    the layout the transition was taken on in GridWorld.grids (see GridWorld.index).
+    index.npy holds the number of rows written to each segment.
+    """
+
+    # column names and on-disk types.
+    COLUMNS = (
+        ('state', np.int32),
+        ('action', np.int8),
+        ('reward', np.float32),
+        ('next_state', np.int32),
+        ('grid', np.int8),
+    )
+
+    # number of transitions per segment.
+    CHUNK_SIZE = 65536
+
+    def __init__(self, path, chunk_size=None):
+        """
+        Args:
+            path (str): Directory to write the log to. Existing segments are appended to.
+            chunk_size (int): Number of transitions per segment.
+
+        Returns:
+            No explicit return value.
+        """
+        self.path = path
+        self.chunk_size = chunk_size or self.CHUNK_SIZE
+
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        # continue after any segments already written to path.
+        self.counts = read_index(path)
+        self.segment = None
+        self.position = 0
+
+    def record(self, state, action, reward, next_state, grid=0):
+        """
+        Append a single transition to the log.
+
+        Args:
+            state (int): Linear index of the current state.
+            action (int): Value of the Actions enum taken in the current state.
+            reward (float): Reward received for the transition.
+            next_state (int): Linear index of the resulting state.
+            grid (int): Position of the grid the transition was taken on in GridWorld.grids.
+        """
+        if self.segment is None or self.position == self.chunk_size:
+            self.open_segment()
+
+        row = (state, action, reward, next_state, grid)
+        for (name, _), value in zip(self.COLUMNS, row):
+            self.segment[name][self.position] = value
+
+        self.position += 1
+        self.counts[-1] = self.position
+
+    def record_step(self, agent, state, new_state):
+        """
+        Append a step taken by an agent to the log.
+
+        The reward is logged without the agent's shaping term, which depends on its
+        gamma (see learn_offline).
+
+        Args:
+            agent (Agent): Agent that took the step.
+            state (tuple): (x, y) coordinates representing previous position of agent.
+            new_state (tuple): (x, y) coordinates representing new position of agent.
+        """
+        self.record(
+            agent.get_linear_index(state),
+            agent.grid.get_action(state, new_state).value,
+            agent.get_reward(new_state, state, shaped=False),
+            agent.get_linear_index(new_state),
+            agent.grid.index,
+        )
+
+    def open_segment(self):
+        """ Flush the current segment and start a new one. """
+        self.flush()
+
+        number = len(self.counts)
+        self.segment = dict(
+            (name, np.memmap(
+                segment_path(self.path, name, number),
+                dtype=dtype,
+                mode='w+',
+                shape=(self.chunk_size,),
+            ))
+            for name, dtype in self.COLUMNS
+        )
+        self.position = 0
+        self.counts.append(0)
+
+    def flush(self):
+        """ Write pending transitions and the segment index to disk. """
+        if self.segment is not None:
+            for column in self.segment.values():
+                column.flush()
+
+        np.save(os.path.join(self.path, 'index.npy'), np.array(self.counts, dtype=np.int64))
+
+    def close(self):
+        """ Flush the log and release the current segment. """
+        self.flush()
+        self.segment = None
+
+
+def read_index(path):
+    """
+    Read number of rows written to each segment of a log.
+
+    Args:
+        path (str): Directory containing the log.
+
+    Returns:
+        list[int]: Number of rows per segment, empty if no log exists at path.
+    """
+    index = os.path.join(path, 'index.npy')
+    if not os.path.exists(index):
+        return []
+
+    return np.load(index).tolist()
+
+
+def segment_path(path, name, number):
+    """ Path of the file storing column name of the given segment. """
+    return os.path.join(path, '{}.{:05d}.bin'.format(name, number))
+
+
+def read_trajectories(paths):
+    """
+    Stream transitions from one or more logs, one segment at a time.
+
+    Args:
+        paths (str|list[str]): Directories containing logs written by TrajectoryRecorder.
+
+    Returns:
+        generator: Yields dicts mapping column names to memory-mapped arrays, one per
+                   segment.
+    """
+    if isinstance(paths, basestring):
+        paths = [paths]
+
+    for path in paths:
+        for number, count in enumerate(read_index(path)):
+            if not count:
+                continue
+
+            yield dict(
+                (name, np.memmap(
+                    segment_path(path, name, number),
+                    dtype=dtype,
+                    mode='r',
+                    shape=(count,),
+                ))
+                for name, dtype in TrajectoryRecorder.COLUMNS
+            )
+
+
+def get_valid_transitions(grid):
+    """
+    Build a matrix marking which state transitions are possible in a grid.
+
+    Args:
+        grid (GridWorld): Grid to extract transitions from.
+
+    Returns:
+        numpy.Array: 2D boolean array, True at [state, new_state] (in linear indices)
+                     if new_state can be reached from state with a single action.
+    """
+    neighbours = Agent(0.0, 0.0, 0.0, grid=grid).neighbours
+    states, actions = np.nonzero(neighbours >= 0)
+
+    valid = np.zeros((grid.size, grid.size), dtype=bool)
+    valid[states, neighbours[states, actions]] = True
+
+    return valid
+
+
+def learn_offline(
+    paths, alpha, gamma, grids=None, epochs=1, Q=None, batch_size=65536, shaping=0.0, grid=None,
+):
+    """
+    Run Q Learning over recorded transitions without simulating the environment.
+
+    Each batch is applied at once: targets are computed from the Q matrix before the
+    batch, and transitions repeated within a batch contribute their mean error.
+
+    Logs spanning a grid switch hold transitions of several layouts, which a single Q
+    matrix can't fit at once, so only transitions recorded on one grid are learned from.
+
+    Args:
+        paths (str|list[str]): Directories containing logs written by TrajectoryRecorder.
+        alpha (float): Learning parameter.
+        gamma (float): Discount factor.
+        grids (list[str|File]): List of files containing representation of grids, as used
+                                when recording.
+        epochs (int): Number of passes over the logs.
+        Q (numpy.Array): Q matrix to start from. Zeros if not provided.
+        batch_size (int): Maximum number of transitions per update.
+        shaping (float): Weight of the distance based reward shaping term added to the
+                         logged rewards (see Agent.get_potential). Disabled if 0.
+        grid (int): Position in grids of the grid to learn. Defaults to the last grid,
+                    which the agent ends up on.
+
+    Returns:
+        numpy.Array: 2D array representing the learned Q matrix.
+    """
+    grids = grids or GridWorld.grids
+    grid = len(grids) - 1 if grid is None else grid
+
+    world = GridWorld(grids=[grids[grid]])
+    valid = get_valid_transitions(world)
+
+    if Q is None:
+        Q = np.zeros((world.size, world.size))
+
+    # shaping potential of every state, in linear indices (see Agent.get_potential).
+    distance = world.distances.ravel(order='F')
+    potential = -shaping * np.where(np.isinf(distance), world.size, distance)
+
+    for _ in xrange(epochs):
+        for segment in read_trajectories(paths):
+            for start in xrange(0, len(segment['state']), batch_size):
+                batch = slice(start, start + batch_size)
+
+                # skip transitions recorded on other grids.
+                rows = np.flatnonzero(segment['grid'][batch] == grid)
+                if not len(rows):
+                    continue
+
+                state = np.asarray(segment['state'][batch][rows], dtype=np.intp)
+                reward = np.asarray(segment['reward'][batch][rows], dtype=Q.dtype)
+                next_state = np.asarray(segment['next_state'][batch][rows], dtype=np.intp)
+
+                if shaping:
+                    reward += gamma * potential[next_state] - potential[state]
+
+                # future value is the best Q value over transitions valid from next_state.
+                future_Q = np.where(valid[next_state], Q[next_state], -np.inf).max(axis=1)
+                future_Q[np.isinf(future_Q)] = 0.0
+
+                error = reward + gamma * future_Q - Q[state, next_state]
+
+                # average errors of transitions repeated within the batch.
+                pairs, inverse = np.unique(state * world.size + next_state, return_inverse=True)
+                total = np.bincount(inverse, weights=error)
+                count = np.bincount(inverse)
+
+                Q.flat[pairs] += alpha * total / count
+
+    return Q
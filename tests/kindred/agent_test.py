@@ -82,6 +82,68 @@ class TestAgent(unittest.TestCase):
         self.assertEqual(action, Actions.DOWN)
         self.assertEqual(reward, 0.8)
     
+    def test_argmax_cache(self):
+        """ Test maximum Q values stay in sync with Q matrix updates. """
+        state = (1, 5)
+        index = self.agent.get_linear_index(state)
+
+        # values such as 0.3 are rounded when stored as float16, and so must be the maximum.
+        for dtype in (np.float64, np.float16):
+            agent = Agent(epsilon=0.5, alpha=0.3, gamma=0.95, dtype=dtype)
+
+            # all actions tie at 0, so the first valid action is chosen.
+            self.assertEqual(agent.argmax(state), agent.argmax(state, Q=agent.Q.copy()))
+
+            # increase, then decrease the value of moving down.
+            agent.update_Q(state, (2, 5), 0.5)
+            self.assertEqual(agent.argmax(state), (Actions.DOWN, 0.5))
+
+            agent.update_Q(state, (1, 6), 0.3)
+            agent.update_Q(state, (2, 5), 0.1)
+            self.assertEqual(agent.argmax(state), (Actions.RIGHT, dtype(0.3)))
+
+            # updating transitions that aren't valid actions leaves the maximum unchanged.
+            agent.update_Q(state, (3, 5), 0.9)
+            self.assertEqual(agent.argmax(state), (Actions.RIGHT, dtype(0.3)))
+
+            # randomly update Q and compare against scanning the valid actions.
+            np.random.seed(0)
+            for _ in xrange(500):
+                x, y = np.random.randint(6), np.random.randint(9)
+                actions = agent.grid.get_valid_actions((x, y))
+                if not agent.grid.is_valid((x, y)):
+                    continue
+
+                action = actions[np.random.randint(len(actions))]
+                new_state = tuple(map(sum, zip((x, y), agent.grid.actions[action])))
+                agent.update_Q((x, y), new_state, np.random.choice([0.0, 0.1, 0.3, 0.5, 1.0]))
+
+                self.assertEqual(agent.argmax((x, y)), agent.argmax((x, y), Q=agent.Q.copy()))
+
+            # resetting the Q matrix resets every maximum, without rebuilding neighbours.
+            neighbours = agent.neighbours
+            agent.reset_Q()
+            self.assertEqual(agent.max_Q[index], 0.0)
+            self.assertIs(agent.neighbours, neighbours)
+
+            max_action, max_Q = agent.get_greedy_actions()
+            self.assertEqual(agent.max_action.tolist(), max_action.tolist())
+            self.assertEqual(agent.max_Q.tolist(), max_Q.tolist())
+
+    def test_get_reward(self):
+        """ Test reward with and without distance based shaping. """
+        self.assertEqual(self.agent.get_reward((5, 4)), 0.0)
+        self.assertEqual(self.agent.get_reward(self.default_goal, (0, 7)), 1.0)
+
+        agent = Agent(epsilon=0.5, alpha=0.3, gamma=0.95, shaping=1.0)
+
+        # moving one step closer to the goal from the start position.
+        self.assertAlmostEqual(agent.get_reward((5, 4)), 0.95 * -9 + 10)
+        # moving away from the goal.
+        self.assertAlmostEqual(agent.get_reward((5, 2)), 0.95 * -11 + 10)
+        # reaching the goal.
+        self.assertAlmostEqual(agent.get_reward(self.default_goal, (0, 7)), 1.0 + 1.0)
+
     def test_get_linear_index(self):
         """ Test translation between state and Q matrix indices. """ 
         self.assertEqual(self.agent.get_linear_index(state=(4, 1)), 10)
@@ -84,3 +84,17 @@ class TestGridWorld(unittest.TestCase):
         
         actions = grid_world.get_valid_actions(state=(1, 5))
         self.assertItemsEqual(actions, [Actions.LEFT, Actions.RIGHT, Actions.UP, Actions.DOWN])
+
+    def test_distances(self):
+        """ Test distances to goal are computed on load and on update. """
+        grid_world = GridWorld()
+
+        self.assertEqual(grid_world.distances[self.default_goal], 0)
+        self.assertEqual(grid_world.distances[self.default_start], 10)
+        self.assertEqual(grid_world.distances[(2, 0)], 10)
+        self.assertEqual(grid_world.distances[(3, 0)], float('inf'))
+
+        grid_world.update_grid(grid=self.test_path)
+        self.assertEqual(grid_world.distances[self.test_goal], 0)
+        self.assertEqual(grid_world.distances[self.test_start], 11)
+        self.assertEqual(grid_world.distances[(0, 1)], float('inf'))
@@ -0,0 +1,88 @@
+import os
+import unittest
+
+import numpy as np
+
+from src.kindred.agent import Agent
+from src.kindred.gridworld import Actions, GridWorld
+from src.kindred.multigrid import coarsen, prolongate, solve_multigrid, value_iteration
+from src.kindred.qlearning import learn
+
+from qlearning_test import get_steps
+
+
+class TestMultigrid(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+
+        cls.test_path = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)),
+            'fixtures/gridTest.txt',
+        )
+        cls.grid_world = GridWorld([cls.test_path])
+
+    def test_coarsen(self):
+        """ Test aggregation of blocks of cells into a coarse grid. """
+        grid, goal = coarsen(self.grid_world.grid, self.grid_world.goal, factor=2)
+
+        # blocks with at least one open cell stay open, and the goal moves to its block.
+        self.assertEqual(grid.tolist(), [
+            [0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 2],
+        ])
+        self.assertEqual(goal, (2, 4))
+
+        grid, goal = coarsen(np.array([[3, 3, 0], [3, 3, 0]]), (0, 2), factor=2)
+        self.assertEqual(grid.tolist(), [[3, 2]])
+
+    def test_prolongate(self):
+        """ Test coarse values are copied to every cell of their block. """
+        V = prolongate(np.array([[1.0, 2.0], [3.0, 4.0]]), (3, 4), factor=2)
+
+        self.assertEqual(V.tolist(), [
+            [1.0, 1.0, 2.0, 2.0],
+            [1.0, 1.0, 2.0, 2.0],
+            [3.0, 3.0, 4.0, 4.0],
+        ])
+
+    def test_value_iteration(self):
+        """ Test values are discounted by the shortest distance to the goal. """
+        V, _ = value_iteration(self.grid_world.grid, self.grid_world.goal, gamma=0.9)
+
+        # start is 11 steps away from the goal, the cell next to it only 1.
+        self.assertAlmostEqual(V[self.grid_world.start], 0.9 ** 10)
+        self.assertAlmostEqual(V[5, 7], 1.0)
+        self.assertEqual(V[self.grid_world.goal], 0.0)
+        self.assertEqual(V[0, 1], 0.0)
+
+    def test_solve_multigrid(self):
+        """ Test multigrid values converge to the values of the full grid. """
+        expected_V, _ = value_iteration(self.grid_world.grid, self.grid_world.goal, gamma=0.9)
+        V, iterations = solve_multigrid(
+            self.grid_world.grid, self.grid_world.goal, gamma=0.9, levels=2, sweeps=None,
+        )
+
+        self.assertEqual(len(iterations), 3)
+        self.assertTrue(np.allclose(V, expected_V, atol=1e-5))
+
+    def test_learn_multigrid(self):
+        """ Test q learning initialized from coarse grids finds the optimal policy. """
+        _, Q = learn(
+            num_episodes=5, epsilon=0.5, alpha=0.3, gamma=0.95, grids=[self.test_path],
+            multigrid_levels=2,
+        )
+        agent = Agent(epsilon=0.5, alpha=0.3, gamma=0.95, grids=[self.test_path])
+
+        # the goal is terminal, so no value exceeds the goal reward.
+        self.assertFalse(Q[agent.get_linear_index(agent.grid.goal)].any())
+        self.assertTrue(Q.max() <= 1.0)
+
+        steps = get_steps(agent=agent, Q=Q)
+
+        #expected steps for optimal policy.
+        expected_steps = [Actions.DOWN for _ in xrange(3)]
+        expected_steps.extend([Actions.RIGHT for _ in xrange(8)])
+
+        self.assertItemsEqual(steps, expected_steps)
@@ -0,0 +1,43 @@
+import unittest
+
+from src.kindred.pool import AsyncLearner
+
+
+class TestAsyncLearner(unittest.TestCase):
+
+    def test_learn(self):
+        """ Test repeated runs on a single pool of agents. """
+        with AsyncLearner(num_agents=2, size=54) as pool:
+            self.assertTrue(pool.startup_time > 0)
+
+            Q = pool.learn(I_async_update=5, T_max=300, epsilon=0.5, alpha=0.3, gamma=0.95)
+            self.assertEqual(Q.shape, (54, 54))
+            self.assertTrue(pool.shared_state.get_T() >= 300)
+
+            # new hyperparameters are picked up by the same agents.
+            Q = pool.learn(
+                I_async_update=5, T_max=300, epsilon=1.0, alpha=0.5, gamma=0.9,
+                adaptive=True, I_bounds=(2, 20),
+            )
+            self.assertEqual(len(pool.intervals), 2)
+            self.assertEqual(Q.shape, (54, 54))
+
+            pool.reset()
+            pool.learn(I_async_update=5, T_max=300, epsilon=0.5, alpha=0.3, gamma=0.95)
+            self.assertEqual(pool.intervals, [])
+
+            self.assertEqual(len(pool.learn_times), 3)
+
+    def test_errors(self):
+        """ Test errors raised by workers reach the caller and leave the pool usable. """
+        with AsyncLearner(num_agents=2, size=54) as pool:
+            # syncing every 0 steps fails in every worker.
+            with self.assertRaises(ZeroDivisionError):
+                pool.learn(I_async_update=0, T_max=300, epsilon=0.5, alpha=0.3, gamma=0.95)
+
+            Q = pool.learn(I_async_update=5, T_max=300, epsilon=0.5, alpha=0.3, gamma=0.95)
+            self.assertEqual(Q.shape, (54, 54))
+
+        # errors while starting up close the pool.
+        with self.assertRaises(IOError):
+            AsyncLearner(num_agents=2, size=54, grids=['missing.txt'])
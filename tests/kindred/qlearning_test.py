@@ -1,11 +1,12 @@
 import os
+import threading
 import unittest
 
 import numpy as np
 
 from src.kindred.agent import Agent
 from src.kindred.gridworld import Actions
-from src.kindred.qlearning import learn
+from src.kindred.qlearning import AdaptiveInterval, SharedState, learn, learn_async
 
 
 class TestQLearning(unittest.TestCase):
@@ -55,6 +56,70 @@ class TestQLearning(unittest.TestCase):
         
         self.assertItemsEqual(steps, expected_steps)
 
+    def test_learn_shaping(self):
+        """ Test reward shaping leaves the optimal policy unchanged. """
+        _, Q = learn(
+            num_episodes=100, epsilon=0.5, alpha=0.3, gamma=0.95, grids=[self.test_path], shaping=0.1,
+        )
+        agent = Agent(epsilon=0.5, alpha=0.3, gamma=0.95, grids=[self.test_path])
+
+        steps = get_steps(agent=agent, Q=Q)
+
+        #expected steps for optimal policy.
+        expected_steps = [Actions.DOWN for _ in xrange(3)]
+        expected_steps.extend([Actions.RIGHT for _ in xrange(8)])
+
+        self.assertItemsEqual(steps, expected_steps)
+
+    def test_adaptive_interval(self):
+        """ Test interval tuning based on lock contention and delta size. """
+        controller = AdaptiveInterval(4, min_interval=2, max_interval=10, max_wait=0.1, max_delta=0.1)
+
+        # large delta halves the interval, bounded by min_interval.
+        self.assertEqual(controller.update(wait_fraction=0.0, delta=0.5), 2)
+        self.assertEqual(controller.update(wait_fraction=0.5, delta=0.5), 2)
+
+        # heavy contention doubles the interval, bounded by max_interval.
+        self.assertEqual(controller.update(wait_fraction=0.5, delta=0.05), 4)
+        self.assertEqual(controller.update(wait_fraction=0.5, delta=0.05), 8)
+        self.assertEqual(controller.update(wait_fraction=0.5, delta=0.05), 10)
+
+        # small deltas without contention grow the interval by one step.
+        controller.interval = 5
+        self.assertEqual(controller.update(wait_fraction=0.0, delta=0.0), 6)
+        self.assertEqual(controller.update(wait_fraction=0.0, delta=0.05), 6)
+
+    def test_learn_async_adaptive(self):
+        """ Test adaptive async q learning reports an interval per agent within bounds. """
+        shared_state = SharedState(54)
+        Q = learn_async(
+            num_agents=2, I_async_update=5, T_max=500, size=54, epsilon=0.5, alpha=0.3,
+            gamma=0.95, adaptive=True, I_bounds=(2, 20), shared_state=shared_state,
+        )
+
+        intervals = shared_state.get_intervals()
+        self.assertEqual(len(intervals), 2)
+        for interval in intervals:
+            self.assertTrue(2 <= interval <= 20)
+        self.assertEqual(Q.shape, (54, 54))
+
+    def test_shared_state_wait_time(self):
+        """ Test only global Q updates count towards the lock wait time, not T. """
+        shared_state = SharedState(54)
+        shared_state.get_Q()
+        shared_state.wait_time = 0.0
+
+        # T can be incremented while another worker holds the global Q lock.
+        with shared_state.lock:
+            thread = threading.Thread(target=shared_state.increment_T)
+            thread.start()
+            thread.join(1.0)
+            self.assertFalse(thread.is_alive())
+
+        thread.join()
+        self.assertEqual(shared_state.get_T(), 1)
+        self.assertEqual(shared_state.wait_time, 0.0)
+
 
 def get_steps(agent, Q):
     """ 
@@ -69,11 +134,13 @@ def get_steps(agent, Q):
                        based on the given Q matrix.
     """
     steps = []
+    visited = set()
 
     state = agent.grid.start
     while state != agent.grid.goal:
         # break if agent is stuck in a loop.
-        if state not in steps:
+        if state not in visited:
+            visited.add(state)
             # retrieve optimal action to take for current state.
             action, _ = agent.argmax(state, Q=Q)
             new_state = tuple(map(sum, zip(state, agent.grid.actions[action])))
@@ -0,0 +1,111 @@
+import os
+import unittest
+
+from src.kindred.agent import Agent
+from src.kindred.gridworld import Actions, GridWorld
+from src.kindred.qlearning import learn
+from src.kindred.remote import EnvironmentClient, EnvironmentServer, RemoteGridWorld, learn_remote
+
+from qlearning_test import get_steps
+
+
+class TestRemote(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+
+        cls.test_path = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)),
+            'fixtures/gridTest.txt',
+        )
+        cls.grid_world = GridWorld([cls.test_path])
+
+        cls.server = EnvironmentServer(grids=[cls.test_path]).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.client = EnvironmentClient(self.server.server_address)
+
+    def tearDown(self):
+        self.client.close()
+
+    def test_protocol(self):
+        """ Test layout, reset and pipelined step requests. """
+        grid = RemoteGridWorld(self.client)
+
+        self.assertEqual(grid.grid.tolist(), self.grid_world.grid.tolist())
+        self.assertEqual(grid.start, self.grid_world.start)
+        self.assertEqual(grid.goal, self.grid_world.goal)
+
+        # send several requests before reading any reply.
+        start = self.client.reset([0, 0])
+        moved = self.client.step([0, 0], [(0, 0), (5, 7)], [Actions.DOWN, Actions.RIGHT])
+        blocked = self.client.step([0], [(0, 0)], [Actions.UP])
+
+        # replies can be read in any order.
+        self.assertEqual(self.client.receive(blocked)['states'], [[0, 0]])
+        self.assertEqual(self.client.receive(start)['states'], [list(grid.start)] * 2)
+
+        reply = self.client.receive(moved)
+        self.assertEqual(reply['states'], [[1, 0], [5, 8]])
+        self.assertEqual(reply['rewards'], [0.0, 1.0])
+        self.assertEqual(reply['done'], [False, True])
+
+    def test_errors(self):
+        """ Test bad requests are reported without closing the connection. """
+        with self.assertRaises(ValueError):
+            self.client.request('layout', grid=7)
+        with self.assertRaises(ValueError):
+            self.client.request('teleport')
+
+        self.assertEqual(self.client.request('info'), {'id': 2, 'grids': 1})
+
+    def test_server_outcome(self):
+        """ Test rewards and episode ends come from the server, with shaping added locally. """
+        grid = RemoteGridWorld(self.client)
+        agent = Agent(epsilon=0.5, alpha=0.3, gamma=0.95, shaping=1.0, grid=grid)
+
+        state = (5, 7)
+        self.assertEqual(grid.simulate(state, Actions.RIGHT), grid.goal)
+        self.assertEqual(agent.get_reward(grid.goal, state, shaped=False), 1.0)
+        self.assertTrue(grid.is_done(grid.goal))
+
+        # a server may report any reward, and end episodes away from the goal.
+        grid.observe(grid.start, (4, 0), 0.5, True)
+        self.assertEqual(agent.get_reward((4, 0), grid.start, shaped=False), 0.5)
+        self.assertAlmostEqual(
+            agent.get_reward((4, 0), grid.start),
+            0.5 + 0.95 * agent.get_potential((4, 0)) - agent.get_potential(grid.start),
+        )
+        self.assertTrue(grid.is_done((4, 0)))
+
+    def test_learn_remote_grid(self):
+        """ Test q learning against a remote grid finds the optimal policy. """
+        _, Q = learn(
+            num_episodes=100, epsilon=0.5, alpha=0.3, gamma=0.95, env=RemoteGridWorld(self.client),
+        )
+        agent = Agent(epsilon=0.5, alpha=0.3, gamma=0.95, grids=[self.test_path])
+
+        steps = get_steps(agent=agent, Q=Q)
+
+        #expected steps for optimal policy.
+        expected_steps = [Actions.DOWN for _ in xrange(3)]
+        expected_steps.extend([Actions.RIGHT for _ in xrange(8)])
+
+        self.assertItemsEqual(steps, expected_steps)
+
+    def test_learn_remote(self):
+        """ Test many agents learning over a single pipelined connection. """
+        results = learn_remote(
+            self.client, num_agents=6, num_episodes=3, epsilon=0.5, alpha=0.3, gamma=0.95, window=3,
+        )
+
+        self.assertEqual(len(results), 6)
+        for steps, Q in results:
+            # every agent needs at least 3 episodes of 11 steps each.
+            self.assertTrue(steps >= 33)
+            self.assertEqual(Q.shape, (self.grid_world.size, self.grid_world.size))
+            self.assertTrue(Q.max() > 0.0)
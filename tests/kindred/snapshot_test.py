@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.kindred.agent import Agent
+from src.kindred.qlearning import SharedState, learn
+from src.kindred.snapshot import dequantize, get_policy_changes, load_Q, quantize, save_Q
+
+
+class TestSnapshot(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+
+        cls.test_path = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)),
+            'fixtures/gridTest.txt',
+        )
+        cls.agent = Agent(epsilon=0.5, alpha=0.3, gamma=0.95, grids=[cls.test_path])
+
+        np.random.seed(0)
+        _, cls.Q = learn(num_episodes=20, epsilon=0.5, alpha=0.3, gamma=0.95, grids=[cls.test_path])
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_quantize(self):
+        """ Test per row quantization error and types. """
+        Q = np.array([[0.0, 0.5, -1.0], [0.0, 0.0, 0.0], [2.0, 1.0, 0.0]])
+
+        for bits, int_type in ((8, np.int8), (16, np.int16)):
+            values, scales = quantize(Q, bits)
+            self.assertEqual(values.dtype, int_type)
+            self.assertEqual(scales.dtype, np.float32)
+
+            # each value is within half a step of its row's scale.
+            decoded = dequantize(values, scales)
+            self.assertTrue((np.abs(decoded - Q) <= scales[:, None] / 2 + 1e-7).all())
+            self.assertEqual(decoded[1].tolist(), [0.0, 0.0, 0.0])
+
+        # stochastic rounding is unbiased, while rounding to nearest is off by 0.3 * 127 - 38.
+        Q = np.full((1, 100001), 0.3)
+        Q[0, 0] = 1.0
+
+        np.random.seed(0)
+        nearest = dequantize(*quantize(Q, 8))[0, 1:].mean()
+        stochastic = dequantize(*quantize(Q, 8, stochastic=True))[0, 1:].mean()
+
+        self.assertTrue(abs(nearest - 0.3) > 5e-4)
+        self.assertTrue(abs(stochastic - 0.3) < 1e-4)
+
+    def test_greedy_actions(self):
+        """ Test reduced precision leaves the greedy action of every state unchanged. """
+        for bits in (8, 16):
+            Q = dequantize(*quantize(self.Q, bits))
+            self.assertEqual(len(get_policy_changes(self.agent, self.Q, Q)), 0)
+
+        for dtype in (np.float32, np.float16):
+            np.random.seed(0)
+            _, Q = learn(
+                num_episodes=20, epsilon=0.5, alpha=0.3, gamma=0.95, grids=[self.test_path], dtype=dtype,
+            )
+            self.assertEqual(Q.dtype, dtype)
+            self.assertEqual(len(get_policy_changes(self.agent, self.Q, Q)), 0)
+
+    def test_save_Q(self):
+        """ Test saving and loading full precision and quantized Q matrices. """
+        path = os.path.join(self.path, 'Q.npz')
+
+        save_Q(path, self.Q.astype(np.float32))
+        Q = load_Q(path)
+        self.assertEqual(Q.dtype, np.float32)
+        self.assertTrue(np.array_equal(Q, self.Q.astype(np.float32)))
+
+        save_Q(path, self.Q, bits=8)
+        Q = load_Q(path, dtype=np.float32)
+        self.assertEqual(Q.dtype, np.float32)
+        self.assertEqual(len(get_policy_changes(self.agent, self.Q, Q)), 0)
+
+    def test_shared_state(self):
+        """ Test global Q round trips through each shared encoding. """
+        for dtype, bits in ((np.float64, None), (np.float16, None), (np.float32, 16)):
+            shared_state = SharedState(self.agent.grid.size, dtype=dtype, bits=bits)
+            self.assertEqual(shared_state.get_Q().tolist(), np.zeros(self.Q.shape).tolist())
+
+            shared_state.update_Q(self.Q)
+            Q = shared_state.get_Q()
+            self.assertEqual(Q.dtype, dtype)
+            self.assertTrue(np.allclose(Q, self.Q, atol=1e-3))
+
+            shared_state.reset()
+            self.assertFalse(shared_state.get_Q().any())
@@ -0,0 +1,70 @@
+import os
+import unittest
+
+import numpy as np
+
+from src.kindred.agent import Agent
+from src.kindred.gridworld import Actions
+from src.kindred.stacked import StackedGridWorld, learn_stacked
+
+from qlearning_test import get_steps
+
+
+class TestStacked(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+
+        cls.test_path = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)),
+            'fixtures/gridTest.txt',
+        )
+        cls.default_grids = ['resources/gridL.txt', 'resources/gridR.txt']
+
+    def test_initialize(self):
+        """ Test grids of every environment are stacked with their transitions. """
+        stack = StackedGridWorld([self.default_grids, [self.test_path]])
+        agent = Agent(epsilon=0.5, alpha=0.3, gamma=0.95)
+
+        self.assertEqual(stack.grids.shape, (3, 6, 9))
+        self.assertEqual(stack.offsets.tolist(), [0, 2, 3])
+        self.assertEqual(stack.schedules, [[Agent.STEPS], []])
+        self.assertEqual(stack.starts[0], agent.get_linear_index(agent.grid.start))
+        self.assertEqual(stack.goals[0], agent.get_linear_index(agent.grid.goal))
+
+        # transitions match the neighbours of an agent on the same grid.
+        self.assertEqual(stack.actions, agent.actions)
+        self.assertEqual(stack.transitions[0].tolist(), agent.get_neighbours().tolist())
+
+    def test_schedules(self):
+        """ Test every environment needs one switch step per additional grid. """
+        with self.assertRaises(ValueError):
+            StackedGridWorld([self.default_grids], schedules=[[]])
+        with self.assertRaises(ValueError):
+            StackedGridWorld([self.default_grids], schedules=[[10, 20]])
+        with self.assertRaises(ValueError):
+            StackedGridWorld([self.default_grids, [self.test_path]], schedules=[[10]])
+
+    def test_learn_stacked(self):
+        """ Test learning several environments at once, with their own switch schedules. """
+        np.random.seed(0)
+
+        stack = StackedGridWorld(
+            [[self.test_path], ['resources/gridL.txt', self.test_path], [self.test_path]],
+            schedules=[[], [1], []],
+        )
+        steps, Q = learn_stacked(stack, num_episodes=100, epsilon=0.5, alpha=0.3, gamma=0.95)
+
+        self.assertTrue(steps > 0)
+        self.assertEqual(Q.shape, (3, 54, 4))
+
+        agent = Agent(epsilon=0.5, alpha=0.3, gamma=0.95, grids=[self.test_path])
+
+        # expected steps for optimal policy on the test grid, which the second environment
+        # switched to after its first step.
+        expected_steps = [Actions.DOWN for _ in xrange(3)]
+        expected_steps.extend([Actions.RIGHT for _ in xrange(8)])
+
+        for environment in xrange(3):
+            steps = get_steps(agent=agent, Q=stack.get_Q(Q, environment))
+            self.assertItemsEqual(steps, expected_steps)
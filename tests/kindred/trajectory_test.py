@@ -0,0 +1,141 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.kindred.agent import Agent
+from src.kindred.gridworld import Actions
+from src.kindred.qlearning import learn
+from src.kindred.trajectory import TrajectoryRecorder, learn_offline, read_trajectories
+
+from qlearning_test import get_steps
+
+
+class TestTrajectory(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+
+        cls.test_path = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)),
+            'fixtures/gridTest.txt',
+        )
+
+    def setUp(self):
+        # intialize empty directory for logs before each test method invocation.
+        self.log_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.log_path)
+
+    def test_record(self):
+        """ Test transitions written across segments are read back in order. """
+        recorder = TrajectoryRecorder(self.log_path, chunk_size=4)
+        for i in xrange(10):
+            recorder.record(i, i % 4, 0.5 * i, i + 1, i // 5)
+        recorder.close()
+
+        segments = list(read_trajectories(self.log_path))
+        self.assertEqual([len(segment['state']) for segment in segments], [4, 4, 2])
+
+        state = np.concatenate([segment['state'] for segment in segments])
+        action = np.concatenate([segment['action'] for segment in segments])
+        reward = np.concatenate([segment['reward'] for segment in segments])
+        next_state = np.concatenate([segment['next_state'] for segment in segments])
+        grid = np.concatenate([segment['grid'] for segment in segments])
+
+        self.assertEqual(state.tolist(), range(10))
+        self.assertEqual(action.tolist(), [i % 4 for i in xrange(10)])
+        self.assertEqual(reward.tolist(), [0.5 * i for i in xrange(10)])
+        self.assertEqual(next_state.tolist(), range(1, 11))
+        self.assertEqual(grid.tolist(), [0] * 5 + [1] * 5)
+
+        # reopening a log appends new segments.
+        recorder = TrajectoryRecorder(self.log_path, chunk_size=4)
+        recorder.record(10, 0, 1.0, 11)
+        recorder.close()
+        self.assertEqual(len(list(read_trajectories(self.log_path))), 4)
+
+    def test_learn_offline(self):
+        """ Test offline q learning from transitions recorded by learn. """
+        recorder = TrajectoryRecorder(self.log_path)
+        learn(
+            num_episodes=100, epsilon=0.5, alpha=0.3, gamma=0.95, grids=[self.test_path],
+            recorder=recorder,
+        )
+        recorder.close()
+
+        Q = learn_offline(
+            self.log_path, alpha=0.5, gamma=0.95, grids=[self.test_path], epochs=50,
+        )
+        agent = Agent(epsilon=0.5, alpha=0.3, gamma=0.95, grids=[self.test_path])
+
+        steps = get_steps(agent=agent, Q=Q)
+
+        #expected steps for optimal policy.
+        expected_steps = [Actions.DOWN for _ in xrange(3)]
+        expected_steps.extend([Actions.RIGHT for _ in xrange(8)])
+
+        self.assertItemsEqual(steps, expected_steps)
+
+    def test_learn_offline_shaping(self):
+        """ Test shaping is logged separately from rewards, and can be applied offline. """
+        recorder = TrajectoryRecorder(self.log_path)
+        learn(
+            num_episodes=100, epsilon=0.5, alpha=0.3, gamma=0.95, grids=[self.test_path],
+            recorder=recorder, shaping=0.1,
+        )
+        recorder.close()
+
+        # only the goal is rewarded in the log.
+        reward = np.concatenate([segment['reward'] for segment in read_trajectories(self.log_path)])
+        self.assertItemsEqual(np.unique(reward).tolist(), [0.0, 1.0])
+
+        # shaping with a different gamma leaves the optimal policy unchanged.
+        Q = learn_offline(
+            self.log_path, alpha=0.5, gamma=0.9, grids=[self.test_path], epochs=50, shaping=0.1,
+        )
+        agent = Agent(epsilon=0.5, alpha=0.3, gamma=0.9, grids=[self.test_path])
+
+        steps = get_steps(agent=agent, Q=Q)
+
+        #expected steps for optimal policy.
+        expected_steps = [Actions.DOWN for _ in xrange(3)]
+        expected_steps.extend([Actions.RIGHT for _ in xrange(8)])
+
+        self.assertItemsEqual(steps, expected_steps)
+
+    def test_learn_offline_switch(self):
+        """ Test offline q learning from a log spanning the switch between grids. """
+        np.random.seed(0)
+        recorder = TrajectoryRecorder(self.log_path)
+        num_steps, _ = learn(
+            num_episodes=600, epsilon=0.5, alpha=0.3, gamma=0.95, recorder=recorder,
+        )
+        recorder.close()
+        self.assertTrue(num_steps > Agent.STEPS)
+
+        # transitions are tagged with the grid they were taken on.
+        grid = np.concatenate([segment['grid'] for segment in read_trajectories(self.log_path)])
+        self.assertEqual(np.unique(grid).tolist(), [0, 1])
+        self.assertTrue((np.diff(grid) >= 0).all())
+
+        # by default the grid the agent ends up on is learned.
+        Q = learn_offline(self.log_path, alpha=0.3, gamma=0.95, epochs=50)
+        agent = Agent(epsilon=0.5, alpha=0.3, gamma=0.95)
+        agent.grid.update_grid()
+        agent.reset_neighbours()
+
+        steps = get_steps(agent=agent, Q=Q)
+
+        #expected steps for optimal policy.
+        expected_steps = [
+            Actions.UP, Actions.LEFT, Actions.LEFT, Actions.LEFT, Actions.UP,
+            Actions.UP, Actions.RIGHT, Actions.RIGHT, Actions.RIGHT, Actions.RIGHT,
+            Actions.RIGHT, Actions.RIGHT, Actions.RIGHT, Actions.RIGHT, Actions.UP,
+            Actions.UP,
+        ]
+
+        self.assertItemsEqual(steps, expected_steps)